@@ -1,12 +1,12 @@
 # encoding=utf-8
 """This file contain a number of functions that can be used to load and compare variant call format files.
-/!\\ Does not support multi-samples files. /!\\
+Multi-samples files can be loaded sample per sample using <load_vcf_samples>.
 
 Critics :
     - A lot of improvement can be done on <_compare_position_alt> since two position are considered
         equivalent when two "<DEL>", two "<INS>" or two "<DUP>" are at the same position with no consideration for the
-        length or for the sequence.
-    - No functions to support multi-samples files
+        length or for the sequence (unless <structural_overlap> is used, see <compare_pair>).
+    - <load_vcf_samples> only use the GT field of samples : other fields (GQ, DP, FT...) are ignored
     - It could a good idea to transform <compare_replicat> into a generator in order to save memory
 """
 __author__ = "Marchal Florent"
@@ -19,6 +19,22 @@ __email__ = "flo.marchal2002@gmail.com"
 __status__ = "Production"
 
 
+import os
+import json
+import mmap
+import struct
+import bisect
+import hashlib
+import heapq
+
+
+STRUCTURAL_ALTERATIONS = ("<DEL>", "<INS>", "<DUP>")    # ALT compared using their spans (see <compare_pair>).
+INDEX_EXTENSION = ".vcfidx"     # Extension of indexes made by <build_position_index>.
+INDEX_MAGIC = b"VCFIDX01"       # First bytes of indexes made by <build_position_index>.
+INDEX_RECORD = "<IqI"           # chromosome id, position, alteration id (see <build_position_index>).
+PARTITION_OPEN_FILES = 128      # Partitions kept open at the same time by <partition_vcf>.
+
+
 def load_vcf_positions(path: str, keep_header: bool = False, keep_path: bool = False,
                        **line_options,
                        ) -> dict:
@@ -105,6 +121,82 @@ def load_vcf_positions(path: str, keep_header: bool = False, keep_path: bool = F
     return vcf_dictionary
 
 
+def load_vcf_samples(path: str, **line_options) -> dict:
+    """Load each sample of a multi-samples variant call format file as if it was a file loaded by
+    <load_vcf_positions>. The file is read once. A sample carry a position when its genotype (GT field) contains at
+    least one alternative allele : this position is only saved for this sample and its "ALT" only contains alleles
+    carried by this sample. When the GT field is missing, samples are considered to carry all alleles of "ALT".
+
+    :param str path:        A path that lead to a Variant Call Format file
+    :param line_options:    keys for <parse_vcf_line> (see <load_vcf_positions>). "FORMAT" and "SAMPLES" columns are
+                                never saved.
+    :return dict: {"{SampleName}" : vcf_dict (see <load_vcf_positions>)}
+    """
+    if "pos" in line_options:
+        raise TypeError("Unexpected keyword argument : 'pos'.")
+    if "chrom" in line_options:
+        raise TypeError("Unexpected keyword argument : 'chrom'.")
+    line_options = {**line_options, "format_": False, "samples": False}
+
+    file = open(path)
+    samples_names = []
+    samples_dict = {}
+
+    for i, lines in enumerate(file):
+        # Remove line break
+        while lines[-1] == "\n":
+            lines = lines[:-1]
+
+        if lines[0:2] == "##":
+            continue
+
+        elif lines[0:1] == "#":
+            # Legend line : names of samples follow FORMAT.
+            samples_names = lines.split("\t")[9:]
+            samples_dict = {names: {} for names in samples_names}
+            continue
+
+        try:
+            line = parse_vcf_line(lines, pos=True, chrom=True, **line_options)
+        except IndexError as E:
+            raise IndexError(f"{E} Line {i}")
+
+        try:
+            position = (line["CHROM"], int(line["POS"]))
+        except ValueError as E:
+            raise ValueError(f"Can not turn position into an integer (line {i}, file {path}). Line ignored")
+
+        split_line = lines.split("\t")
+        alleles = split_line[4].split(",")
+        format_ = split_line[8].split(":") if len(split_line) > 8 else []
+        gt_index = format_.index("GT") if "GT" in format_ else None
+
+        for names, sample in zip(samples_names, split_line[9:]):
+            if gt_index is None:
+                sample_line = line
+            else:
+                fields = sample.split(":")
+                genotype = fields[gt_index] if gt_index < len(fields) else "."
+                carried = sorted({int(allele) for allele in genotype.replace("|", "/").split("/")
+                                  if allele.isdigit() and 0 < int(allele) <= len(alleles)})
+                if len(carried) == 0:
+                    # Reference or missing genotype.
+                    continue
+
+                sample_line = line
+                if "ALT" in line and len(carried) < len(alleles):
+                    sample_line = {**line, "ALT": ",".join(alleles[allele - 1] for allele in carried)}
+
+            vcf_dictionary = samples_dict[names]
+            if position not in vcf_dictionary:
+                vcf_dictionary[position] = [sample_line]
+            else:
+                vcf_dictionary[position].append(sample_line)
+
+    file.close()
+    return samples_dict
+
+
 def parse_vcf_line(line: str, parse_info: bool = True, all_=True,
                    chrom=None, pos=None, id_=None, ref=None, alt=None, qual=None, filter_=None, info=None,
                    format_=None, samples=None,
@@ -192,6 +284,7 @@ def parse_vcf_line_info(info: str) -> dict:
 
 
 def compare_replicat(offset: int = 0, sequence_threshold: float = None, quiet: bool = True,
+                     structural_overlap: float = None, blocked: bool = False,
                      **replicates) -> (dict[str], dict[tuple[int, str]]):
     """Compare a number of replicates using their positions alterations. All replicates are compared two per two.
     A score of global similarity and a score of inclusion is given for all replicates.
@@ -224,6 +317,8 @@ def compare_replicat(offset: int = 0, sequence_threshold: float = None, quiet: b
             - The two positions have a "<DUP>" alteration
             - The two positions have the exact same sequence (<sequence_threshold> is None)
             - The two positions have similar enough sequence (<sequence_threshold> is an integer)
+    When <structural_overlap> is used, "<DEL>", "<INS>" and "<DUP>" do not follow these rules : two structural variants
+    of the same type match when their spans overlap each other enough (see <compare_pair>).
 
     -- --- Functions arguments --- ---
     :param int offset:          How close the position should be to be compared to each-others.
@@ -231,6 +326,11 @@ def compare_replicat(offset: int = 0, sequence_threshold: float = None, quiet: b
                                     If None, sequences has to be the same.
     :param bool quiet:          False: This function will print a progress bar to show the progression.
                                 True: This function will not print anything.
+    :param float structural_overlap: Minimal reciprocal overlap (percent) of two structural variants. If None,
+                                    structural variants are compared as other positions.
+    :param bool blocked:        If True, positions of each replicate are sorted by blocks of <offset> + 1 bases
+                                    and only neighbouring blocks are searched (see <position_blocks>). Results are
+                                    the same. Faster when <offset> is large.
     :param replicates: At least two replicates. replicates names can not be '__MEANS__'.
         replicate_name=replicate_dict.
     :return tuple[dict]:
@@ -262,12 +362,14 @@ def compare_replicat(offset: int = 0, sequence_threshold: float = None, quiet: b
     if (sequence_threshold is not None) and (not 0 <= sequence_threshold <= 100):
         raise ValueError("<sequence_threshold> should be None or a number "
                          "greater or equal to 0 and lower or equal to 100")
+    if (structural_overlap is not None) and (not 0 <= structural_overlap <= 100):
+        raise ValueError("<structural_overlap> should be None or a number "
+                         "greater or equal to 0 and lower or equal to 100")
     if offset < 0:
         offset = 0
 
-    # Prepare some variable for __MEANS__ and for the progressbar
+    # Prepare some variable for the progressbar
     number_of_replicates = len(replicates)
-    number_of_comparison_per_replicates = number_of_replicates - 1
     number_of_comparison = 0
     for i in range(0, number_of_replicates):
         number_of_comparison += i
@@ -288,6 +390,16 @@ def compare_replicat(offset: int = 0, sequence_threshold: float = None, quiet: b
     replicates_list = [(dict_name, dic_, len(dic_)) for dict_name, dic_ in replicates.items()]
     comparison_errors = []
 
+    # Structural variants are indexed once per replicate.
+    structures = {}
+    if structural_overlap is not None:
+        structures = {dict_name: structural_intervals(dic_) for dict_name, dic_ in replicates.items()}
+
+    # Blocks are made once per replicate.
+    blocks = {}
+    if blocked:
+        blocks = {dict_name: position_blocks(dic_, offset + 1) for dict_name, dic_ in replicates.items()}
+
     # Begin the comparisons:
     for i, (main_name, main_dict, main_length) in enumerate(replicates_list[:-1]):
         for second_name, second_dict, second_length in replicates_list[i + 1:]:
@@ -302,111 +414,18 @@ def compare_replicat(offset: int = 0, sequence_threshold: float = None, quiet: b
             # loop reach his position.
             # The complexity of this nested loops follow a binomial coefficient of parameter ('max', 2)
             # -- -- -- -- -- -- -- -- --
-            # <main_match> and <second_match> will respectively contain all match made by main_dict's and second_dict's
-            #           Positions. We use a set instead of a simpler counter in order to avoid counting
-            #           multiple times one match when <offset> is greater than 0.
-            # -- -- -- -- -- -- -- -- --
-
-            # Comparisons variable
-            main_match = set()
-            second_match = set()
-            max_matches = main_length + second_length
-
-            # Match finder
-            for initial_pos in main_dict:  # <initial_pos> is a position without any offset
-                for j in range(-offset, offset + 1):
-                    current_pos = (initial_pos[0], initial_pos[1] + j)
-                    # <current_pos> is a position with an offset of <j>
-
-                    if current_pos not in second_dict:
-                        # No position match with this offset.
-                        continue
-                    else:
-                        try:
-                            results = _compare_position_alt(main_dict[initial_pos], second_dict[current_pos],
-                                                            sequence_threshold=sequence_threshold)
-                        except KeyError as E:
-                            if not quiet:
-                                comparison_errors.append(f"Can not proceed to the comparison of the position "
-                                                         f"{initial_pos} (from {main_name}) "
-                                                         f"with the position {current_pos} (from {second_name}) : {E}")
-                            continue
-
-                        if not results:
-                            # This position does not fulfill requirement and so can not be kept as identical.
-                            continue
-
-                    # Store those positions as they passed earlier verification.
-                    main_match.add(initial_pos)
-                    second_match.add(current_pos)
-
-                    # Store Positions
-                    if initial_pos not in positions_dict:
-                        initials_alterations = {}
-                        positions_dict[initial_pos] = [set(), number_of_replicates, initials_alterations]
-                    else:
-                        initials_alterations = positions_dict[initial_pos][-1]
-
-                    if current_pos not in positions_dict:
-                        current_alterations = {}
-                        positions_dict[current_pos] = [set(), number_of_replicates, current_alterations]
-                    else:
-                        current_alterations = positions_dict[current_pos][-1]
-
-                    # <positions_dict[initial_pos][0]> is a set for the same raisons as <main_match>.
-                    positions_dict[initial_pos][0].add(second_name)
-                    positions_dict[current_pos][0].add(main_name)
-
-                    for alt in results:
-                        if isinstance(alt, tuple):
-                            alt, second_alt = alt
-                        else:
-                            second_alt = alt
-
-                        if alt not in initials_alterations:
-                            initials_alterations[alt] = 0
-                        if second_alt not in current_alterations:
-                            current_alterations[second_alt] = 0
-
-                        initials_alterations[alt] += 0.5
-                        current_alterations[second_alt] += 0.5
-
-            # Assure that names are in <score_dict>:
-            if main_name not in score_dict:
-                score_dict[main_name] = {}
-                score_dict["__MEANS__"][main_name] = [0, 0]
-            if second_name not in score_dict:
-                score_dict[second_name] = {}
-                score_dict["__MEANS__"][second_name] = [0, 0]
-
-            # Global comparison score
-            global_match = len(main_match) + len(second_match)
-            if max_matches != 0:
-                global_percent = round(global_match / max_matches * 100, 2)
-                global_result = (global_percent, global_match, max_matches)
-            else:
-                global_result = (100, 0, 0)
-
-            # Save results in <score_dict>:
-            second_score = (
-                round(len(main_match) / main_length * 100, 2) if main_length > 0 else 100,
-                len(main_match),
-                main_length)
-
-            main_score = (
-                round(len(second_match) / second_length * 100, 2) if second_length > 0 else 100,
-                len(second_match),
-                second_length)
-
-            score_dict[main_name][second_name] = (*global_result, *second_score)
-            score_dict[second_name][main_name] = (*global_result, *main_score)
-
-            # Save results in __MEANS__
-            score_dict["__MEANS__"][main_name][0] += global_result[0] / number_of_comparison_per_replicates
-            score_dict["__MEANS__"][main_name][1] += main_score[0] / number_of_comparison_per_replicates
-            score_dict["__MEANS__"][second_name][0] += global_result[0] / number_of_comparison_per_replicates
-            score_dict["__MEANS__"][second_name][1] += second_score[0] / number_of_comparison_per_replicates
-            score_dict["__MEANS__"]["__MEANS__"][0] += global_result[0] / number_of_comparison
+            main_match, second_match = compare_pair(main_name, main_dict, second_name, second_dict,
+                                                    offset=offset, sequence_threshold=sequence_threshold,
+                                                    positions_dict=positions_dict,
+                                                    number_of_replicates=number_of_replicates,
+                                                    comparison_errors=None if quiet else comparison_errors,
+                                                    structural_overlap=structural_overlap,
+                                                    main_structures=structures.get(main_name),
+                                                    second_structures=structures.get(second_name),
+                                                    blocked=blocked, second_blocks=blocks.get(second_name))
+
+            save_pair_scores(score_dict, main_name, main_length, len(main_match),
+                             second_name, second_length, len(second_match), number_of_replicates)
 
             # Update the progress bar
             if not quiet:
@@ -428,7 +447,928 @@ def compare_replicat(offset: int = 0, sequence_threshold: float = None, quiet: b
     return score_dict, positions_dict
 
 
-def _compare_position_alt(main_items: list, second_items: list, sequence_threshold: float = None):
+def compare_pair(main_name: str, main_dict: dict, second_name: str, second_dict: dict, offset: int = 0,
+                 sequence_threshold: float = None, positions_dict: dict = None, number_of_replicates: int = 2,
+                 comparison_errors: list = None, structural_overlap: float = None, main_structures: dict = None,
+                 second_structures: dict = None, blocked: bool = False, second_blocks: dict = None) -> (set, set):
+    """Compare two replicates (see <compare_replicat> for rules). This is the comparison made by <compare_replicat>
+    for each couple of replicates.
+
+    :param str main_name:           Name of the first replicate.
+    :param dict main_dict:          The first replicate (see <load_vcf_positions>).
+    :param str second_name:         Name of the second replicate.
+    :param dict second_dict:        The second replicate (see <load_vcf_positions>).
+    :param int offset:              How close the position should be to be compared to each-others.
+    :param float sequence_threshold: How similar two sequences must be to consider them as identical.
+                                        If None, sequences has to be the same.
+    :param dict positions_dict:     If not None, matching positions are stored inside this dict (see the second item
+                                        returned by <compare_replicat>).
+    :param int number_of_replicates: Number of replicates stored for new positions inside <positions_dict>.
+    :param list comparison_errors:  If not None, positions that can not be compared are described inside this list.
+    :param float structural_overlap: If not None, structural variants ("<DEL>", "<INS>", "<DUP>") are not compared
+                                        using <offset>. Two structural variants of the same type match when their
+                                        spans have a reciprocal overlap greater or equal to <structural_overlap>
+                                        percent (see <structural_intervals>). Lines need an "INFO".
+    :param dict main_structures:    Result of <structural_intervals> for <main_dict>. Computed if None.
+    :param dict second_structures:  Result of <structural_intervals> for <second_dict>. Computed if None.
+    :param bool blocked:            If True, positions of <second_dict> close to a position are found using blocks
+                                        (see <position_blocks>) instead of trying each position of the offset.
+                                        Results are the same. Faster when <offset> is large.
+    :param dict second_blocks:      Result of <position_blocks> for <second_dict> (blocks of <offset> + 1).
+                                        Computed if None and <blocked> is True.
+    :return tuple[set]: Positions of <main_dict> that match with <second_dict> and positions of <second_dict> that
+                            match with <main_dict>.
+    """
+    # <main_match> and <second_match> will respectively contain all match made by main_dict's and second_dict's
+    #           Positions. We use a set instead of a simpler counter in order to avoid counting
+    #           multiple times one match when <offset> is greater than 0.
+    main_match = set()
+    second_match = set()
+
+    if blocked and second_blocks is None:
+        second_blocks = position_blocks(second_dict, offset + 1)
+
+    # Match finder
+    for initial_pos in main_dict:  # <initial_pos> is a position without any offset
+        if second_blocks is None:
+            chrom, position = initial_pos
+            neighbours = [(chrom, current) for current in range(position - offset, position + offset + 1)
+                          if (chrom, current) in second_dict]
+        else:
+            neighbours = _block_neighbours(second_blocks, initial_pos, offset)
+
+        for current_pos in neighbours:
+            # <current_pos> is a position inside [<initial_pos> - <offset> ; <initial_pos> + <offset>]
+
+            if current_pos not in second_dict:
+                # No position match with this offset.
+                continue
+            else:
+                try:
+                    results = _compare_position_alt(main_dict[initial_pos], second_dict[current_pos],
+                                                    sequence_threshold=sequence_threshold,
+                                                    skip_structural=structural_overlap is not None)
+                except KeyError as E:
+                    if comparison_errors is not None:
+                        comparison_errors.append(f"Can not proceed to the comparison of the position "
+                                                 f"{initial_pos} (from {main_name}) "
+                                                 f"with the position {current_pos} (from {second_name}) : {E}")
+                    continue
+
+                if not results:
+                    # This position does not fulfill requirement and so can not be kept as identical.
+                    continue
+
+            # Store those positions as they passed earlier verification.
+            main_match.add(initial_pos)
+            second_match.add(current_pos)
+
+            if positions_dict is not None:
+                _save_position_match(positions_dict, initial_pos, current_pos, results, main_name, second_name,
+                                     number_of_replicates)
+
+    # Structural variants finder
+    if structural_overlap is not None:
+        if main_structures is None:
+            main_structures = structural_intervals(main_dict)
+        if second_structures is None:
+            second_structures = structural_intervals(second_dict)
+
+        for chrom, (main_intervals, _) in main_structures.items():
+            if chrom not in second_structures:
+                continue
+            second_tree = second_structures[chrom][1]
+
+            for start, end, position, alt in main_intervals:
+                for second_start, second_end, second_position, second_alt in query_interval_tree(second_tree,
+                                                                                                 start, end):
+                    if alt != second_alt or not _reciprocal_overlap(start, end, second_start, second_end,
+                                                                    structural_overlap):
+                        continue
+
+                    initial_pos, current_pos = (chrom, position), (chrom, second_position)
+                    main_match.add(initial_pos)
+                    second_match.add(current_pos)
+                    if positions_dict is not None:
+                        _save_position_match(positions_dict, initial_pos, current_pos, [alt], main_name,
+                                             second_name, number_of_replicates)
+
+    return main_match, second_match
+
+
+def position_blocks(vcf_dict: dict, block_size: int) -> dict:
+    """Sort positions of a replicate by blocks of <block_size> bases. When <block_size> is greater than an offset,
+    positions close to a position (see <compare_pair>) are inside its block or inside the two neighbouring blocks.
+
+    :param dict vcf_dict:   A replicate (see <load_vcf_positions>).
+    :param int block_size:  Number of bases of a block (greater or equal to 1).
+    :return dict: {(chromosome, block number): sorted list of positions (int)}
+    """
+    blocks = {}
+    for chrom, position in vcf_dict:
+        key = (chrom, position // block_size)
+        if key not in blocks:
+            blocks[key] = [position]
+        else:
+            blocks[key].append(position)
+
+    for positions in blocks.values():
+        positions.sort()
+    return blocks
+
+
+def _block_neighbours(blocks: dict, initial_pos: tuple, offset: int) -> list[tuple]:
+    """Internal function. Positions inside <blocks> (see <position_blocks>, blocks of <offset> + 1 bases) that are
+    inside [<initial_pos> - <offset> ; <initial_pos> + <offset>].
+
+    :param dict blocks:         Result of <position_blocks>.
+    :param tuple initial_pos:   (chromosome, position).
+    :param int offset:          See <compare_pair>.
+    :return list[tuple]: Positions sorted in ascending order (the order used by <compare_pair> without blocks).
+    """
+    chrom, position = initial_pos
+    block = position // (offset + 1)
+    lowest, highest = position - offset, position + offset
+
+    neighbours = []
+    for current_block in (block - 1, block, block + 1):
+        positions = blocks.get((chrom, current_block))
+        if positions is None:
+            continue
+        for index in range(bisect.bisect_left(positions, lowest), len(positions)):
+            if positions[index] > highest:
+                return neighbours
+            neighbours.append((chrom, positions[index]))
+    return neighbours
+
+
+def structural_intervals(vcf_dict: dict) -> dict:
+    """Index structural variants ("<DEL>", "<INS>", "<DUP>") of a replicate inside an interval tree per chromosome
+    (see <build_interval_tree>). The span of a variant goes from POS to the END field of its INFO. When END is
+    missing (or not after POS, as for most "<INS>"), POS + |SVLEN| is used. When both are missing, the span is POS.
+
+    :param dict vcf_dict:   A replicate (see <load_vcf_positions>). Lines need an "ALT" and an "INFO" (parsed or not).
+    :return dict: {chromosome: (list of intervals, interval tree)} where intervals are
+                    (start, end, position, alt) and are sorted by start.
+    """
+    intervals_per_chrom = {}
+    for (chrom, position), lines in vcf_dict.items():
+        for line in lines:
+            if line["ALT"] not in STRUCTURAL_ALTERATIONS:
+                continue
+
+            info = line.get("INFO", "")
+            if isinstance(info, str):
+                info = parse_vcf_line_info(info)
+
+            try:
+                end = int(info.get("END", position))
+            except ValueError:
+                end = position
+            if end <= position and "SVLEN" in info:
+                try:
+                    end = position + abs(int(info["SVLEN"].split(",")[0]))
+                except ValueError:
+                    end = position
+
+            if chrom not in intervals_per_chrom:
+                intervals_per_chrom[chrom] = []
+            intervals_per_chrom[chrom].append((position, max(end, position), position, line["ALT"]))
+
+    return {chrom: (sorted(intervals), build_interval_tree(intervals))
+            for chrom, intervals in intervals_per_chrom.items()}
+
+
+def build_interval_tree(intervals: list[tuple]) -> tuple:
+    """Build a centered interval tree. Each node is a tuple : (center, intervals that contain center sorted by start,
+    the same intervals sorted by end (decreasing), left node, right node). Use <query_interval_tree> to find
+    intervals that overlap a span in O(log(n) + number of results).
+
+    :param list intervals:  A list of tuples. The first item of each tuple is the start of the interval and the
+                                second item is its end (included). Other items are kept as they are.
+    :return tuple: The root of the tree. None if <intervals> is empty.
+    """
+    if len(intervals) == 0:
+        return None
+
+    bounds = sorted(bound for interval in intervals for bound in interval[0:2])
+    center = bounds[len(bounds) // 2]
+
+    left, right, overlapping = [], [], []
+    for interval in intervals:
+        if interval[1] < center:
+            left.append(interval)
+        elif interval[0] > center:
+            right.append(interval)
+        else:
+            overlapping.append(interval)
+
+    return (center,
+            sorted(overlapping, key=lambda interval: interval[0]),
+            sorted(overlapping, key=lambda interval: interval[1], reverse=True),
+            build_interval_tree(left),
+            build_interval_tree(right))
+
+
+def query_interval_tree(tree: tuple, start: int, end: int) -> list[tuple]:
+    """Find intervals of a tree built by <build_interval_tree> that overlap [<start>, <end>].
+
+    :param tuple tree:  A tree built by <build_interval_tree>.
+    :param int start:   Start of the span.
+    :param int end:     End of the span (included).
+    :return list[tuple]: Intervals that overlap the span.
+    """
+    found = []
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        if node is None:
+            continue
+        center, by_start, by_end, left, right = node
+
+        if end < center:
+            # Only intervals that start before <end> can overlap.
+            for interval in by_start:
+                if interval[0] > end:
+                    break
+                found.append(interval)
+            nodes.append(left)
+
+        elif start > center:
+            # Only intervals that end after <start> can overlap.
+            for interval in by_end:
+                if interval[1] < start:
+                    break
+                found.append(interval)
+            nodes.append(right)
+
+        else:
+            # <center> is inside the span : all intervals of this node overlap.
+            found.extend(by_start)
+            nodes.append(left)
+            nodes.append(right)
+
+    return found
+
+
+def _reciprocal_overlap(start: int, end: int, second_start: int, second_end: int, threshold: float) -> bool:
+    """Internal function. Do two spans overlap each other by at least <threshold> percent of their own length ?
+
+    :return bool: True if the overlap is at least <threshold> percent of both spans.
+    """
+    overlap = min(end, second_end) - max(start, second_start) + 1
+    if overlap <= 0:
+        return False
+    return (overlap * 100 >= threshold * (end - start + 1)) and (overlap * 100 >= threshold * (second_end -
+                                                                                             second_start + 1))
+
+
+def _save_position_match(positions_dict: dict, initial_pos: tuple, current_pos: tuple, results: list,
+                         main_name: str, second_name: str, number_of_replicates: int):
+    """Internal function. Store a match between <initial_pos> (from <main_name>) and <current_pos>
+    (from <second_name>) inside <positions_dict> (see <compare_replicat>).
+
+    :param list results:    Alterations that match (see <_compare_position_alt>).
+    """
+    # Store Positions
+    if initial_pos not in positions_dict:
+        initials_alterations = {}
+        positions_dict[initial_pos] = [set(), number_of_replicates, initials_alterations]
+    else:
+        initials_alterations = positions_dict[initial_pos][-1]
+
+    if current_pos not in positions_dict:
+        current_alterations = {}
+        positions_dict[current_pos] = [set(), number_of_replicates, current_alterations]
+    else:
+        current_alterations = positions_dict[current_pos][-1]
+
+    # <positions_dict[initial_pos][0]> is a set for the same raisons as <main_match>.
+    positions_dict[initial_pos][0].add(second_name)
+    positions_dict[current_pos][0].add(main_name)
+
+    for alt in results:
+        if isinstance(alt, tuple):
+            alt, second_alt = alt
+        else:
+            second_alt = alt
+
+        if alt not in initials_alterations:
+            initials_alterations[alt] = 0
+        if second_alt not in current_alterations:
+            current_alterations[second_alt] = 0
+
+        initials_alterations[alt] += 0.5
+        current_alterations[second_alt] += 0.5
+
+
+def save_pair_scores(score_dict: dict, main_name: str, main_length: int, main_matches: int,
+                     second_name: str, second_length: int, second_matches: int, number_of_replicates: int):
+    """Store scores of a comparison between two replicates inside <score_dict> (see <compare_replicat>) and update
+    means stored inside <score_dict>["__MEANS__"]. Couples of replicates have to be saved in the order used by
+    <compare_replicat> to obtain the exact same means.
+
+    :param dict score_dict:     The first dict returned by <compare_replicat>. Should at least contain
+                                    {"__MEANS__": {"__MEANS__": [0]}}.
+    :param str main_name:       Name of the first replicate.
+    :param int main_length:     Number of positions inside the first replicate.
+    :param int main_matches:    Number of positions of the first replicate that match with the second one.
+    :param str second_name:     Name of the second replicate.
+    :param int second_length:   Number of positions inside the second replicate.
+    :param int second_matches:  Number of positions of the second replicate that match with the first one.
+    :param int number_of_replicates: Number of replicates compared to each others.
+    """
+    number_of_comparison_per_replicates = number_of_replicates - 1
+    number_of_comparison = number_of_replicates * (number_of_replicates - 1) // 2
+    max_matches = main_length + second_length
+
+    # Assure that names are in <score_dict>:
+    if main_name not in score_dict:
+        score_dict[main_name] = {}
+        score_dict["__MEANS__"][main_name] = [0, 0]
+    if second_name not in score_dict:
+        score_dict[second_name] = {}
+        score_dict["__MEANS__"][second_name] = [0, 0]
+
+    # Global comparison score
+    global_match = main_matches + second_matches
+    if max_matches != 0:
+        global_percent = round(global_match / max_matches * 100, 2)
+        global_result = (global_percent, global_match, max_matches)
+    else:
+        global_result = (100, 0, 0)
+
+    # Save results in <score_dict>:
+    second_score = (
+        round(main_matches / main_length * 100, 2) if main_length > 0 else 100,
+        main_matches,
+        main_length)
+
+    main_score = (
+        round(second_matches / second_length * 100, 2) if second_length > 0 else 100,
+        second_matches,
+        second_length)
+
+    score_dict[main_name][second_name] = (*global_result, *second_score)
+    score_dict[second_name][main_name] = (*global_result, *main_score)
+
+    # Save results in __MEANS__
+    score_dict["__MEANS__"][main_name][0] += global_result[0] / number_of_comparison_per_replicates
+    score_dict["__MEANS__"][main_name][1] += main_score[0] / number_of_comparison_per_replicates
+    score_dict["__MEANS__"][second_name][0] += global_result[0] / number_of_comparison_per_replicates
+    score_dict["__MEANS__"][second_name][1] += second_score[0] / number_of_comparison_per_replicates
+    score_dict["__MEANS__"]["__MEANS__"][0] += global_result[0] / number_of_comparison
+
+
+def partition_vcf(path: str, folder: str, **line_options) -> tuple:
+    """Split the body of a variant call format file into one file per chromosome (partitions) inside <folder>.
+    Lines are checked as <load_vcf_positions> would do, so a file that can not be loaded can not be partitioned.
+    Each partition start with the legend of <path> : partitions can be loaded by <load_vcf_positions> and
+    <load_vcf_samples>.
+
+    :param str path:        A path that lead to a Variant Call Format file
+    :param str folder:      An existing folder where partitions are written.
+    :param line_options:    keys for <parse_vcf_line> (see <load_vcf_positions>).
+    :return tuple: ({"{chromosome}": "{partition path}", ...}, [names of samples found in the legend])
+    """
+    file = open(path)
+    legend = "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+    partitions = {}
+    handles = {}    # Open partitions. Closed when there is too much of them.
+
+    try:
+        for i, lines in enumerate(file):
+            # Remove line break
+            while lines[-1] == "\n":
+                lines = lines[:-1]
+
+            if lines[0:2] == "##":
+                continue
+            elif lines[0:1] == "#":
+                legend = lines + "\n"
+                continue
+
+            try:
+                line = parse_vcf_line(lines, pos=True, chrom=True, **line_options)
+            except IndexError as E:
+                raise IndexError(f"{E} Line {i}")
+            try:
+                int(line["POS"])
+            except ValueError as E:
+                raise ValueError(f"Can not turn position into an integer (line {i}, file {path}). Line ignored")
+
+            chrom = line["CHROM"]
+            if chrom not in handles:
+                if len(handles) >= PARTITION_OPEN_FILES:
+                    for handle in handles.values():
+                        handle.close()
+                    handles = {}
+
+                if chrom not in partitions:
+                    partitions[chrom] = os.path.join(folder, f"{len(partitions)}.vcf")
+                    handles[chrom] = open(partitions[chrom], "w")
+                    handles[chrom].write(legend)
+                else:
+                    handles[chrom] = open(partitions[chrom], "a")
+
+            handles[chrom].write(lines + "\n")
+
+    finally:
+        for handle in handles.values():
+            handle.close()
+        file.close()
+
+    return partitions, legend[:-1].split("\t")[9:]
+
+
+def compare_replicat_by_chromosome(replicates_names: list[str], chromosomes: list[str], load_chromosome,
+                                   offset: int = 0, sequence_threshold: float = None, quiet: bool = True,
+                                   structural_overlap: float = None, save_positions=None,
+                                   blocked: bool = False) -> dict:
+    """Same as <compare_replicat> but replicates are loaded and compared one chromosome at a time : only one
+    chromosome of each replicate is in memory. Positions can not match across chromosomes, so scores are the same
+    as the ones of <compare_replicat>.
+
+    :param list replicates_names:   Names of replicates (see <compare_replicat>). The order of comparisons follow
+                                        this list.
+    :param list chromosomes:        Chromosomes to compare.
+    :param load_chromosome:         A function that take a chromosome and return {replicate name: vcf_dict} with
+                                        only positions of this chromosome (see <load_vcf_positions>). Replicates
+                                        without position on this chromosome can be missing.
+    :param function save_positions: If not None, this function is called with positions of each chromosome (see
+                                        the second item returned by <compare_replicat>) once they are complete.
+    :param bool blocked:            See <compare_replicat>.
+    (See <compare_replicat> for other arguments)
+    :return dict: See the first item returned by <compare_replicat>.
+    """
+    # Some verification
+    if len(replicates_names) < 2:
+        raise ValueError("Not enough replicate provided. At least two replicate are expected.")
+    if "__MEANS__" in replicates_names:
+        raise NameError("Can not compute replicates with '__MEANS__' as name.")
+    if (sequence_threshold is not None) and (not 0 <= sequence_threshold <= 100):
+        raise ValueError("<sequence_threshold> should be None or a number "
+                         "greater or equal to 0 and lower or equal to 100")
+    if (structural_overlap is not None) and (not 0 <= structural_overlap <= 100):
+        raise ValueError("<structural_overlap> should be None or a number "
+                         "greater or equal to 0 and lower or equal to 100")
+    if offset < 0:
+        offset = 0
+
+    number_of_replicates = len(replicates_names)
+    lengths = {names: 0 for names in replicates_names}
+    matches = {}    # (main name, second name) : [main matches, second matches]
+    comparison_errors = []
+
+    for chromosome_index, chrom in enumerate(chromosomes):
+        replicates = load_chromosome(chrom)
+        replicates = {names: replicates.get(names, {}) for names in replicates_names}
+        positions_dict = {} if save_positions is not None else None
+
+        structures = {}
+        if structural_overlap is not None:
+            structures = {names: structural_intervals(dic_) for names, dic_ in replicates.items()}
+        blocks = {}
+        if blocked:
+            blocks = {names: position_blocks(dic_, offset + 1) for names, dic_ in replicates.items()}
+
+        for names, dic_ in replicates.items():
+            lengths[names] += len(dic_)
+
+        # Same loops as <compare_replicat>.
+        for i, main_name in enumerate(replicates_names[:-1]):
+            for second_name in replicates_names[i + 1:]:
+                main_match, second_match = compare_pair(main_name, replicates[main_name], second_name,
+                                                        replicates[second_name], offset=offset,
+                                                        sequence_threshold=sequence_threshold,
+                                                        positions_dict=positions_dict,
+                                                        number_of_replicates=number_of_replicates,
+                                                        comparison_errors=None if quiet else comparison_errors,
+                                                        structural_overlap=structural_overlap,
+                                                        main_structures=structures.get(main_name),
+                                                        second_structures=structures.get(second_name),
+                                                        blocked=blocked, second_blocks=blocks.get(second_name))
+                pair_matches = matches.setdefault((main_name, second_name), [0, 0])
+                pair_matches[0] += len(main_match)
+                pair_matches[1] += len(second_match)
+
+        if save_positions is not None:
+            save_positions(positions_dict)
+        if not quiet: print(f"Chromosome {chrom} compared ({chromosome_index + 1} / {len(chromosomes)}).")
+
+    # Scores are saved in the order used by <compare_replicat>.
+    score_dict = {"__MEANS__": {"__MEANS__": [0]}}
+    for i, main_name in enumerate(replicates_names[:-1]):
+        for second_name in replicates_names[i + 1:]:
+            main_matches, second_matches = matches.get((main_name, second_name), (0, 0))
+            save_pair_scores(score_dict, main_name, lengths[main_name], main_matches,
+                             second_name, lengths[second_name], second_matches, number_of_replicates)
+
+    if not quiet:
+        for items in comparison_errors:
+            # Show problematics lines
+            print(items)
+        print()
+
+    return score_dict
+
+
+def sketch_positions(vcf_dict: dict, sketch_size: int = 256, bin_size: int = 1) -> list[int]:
+    """Summarize the alterations of a replicate with a bottom-k MinHash sketch : each alteration is turned into a
+    (chromosome, binned position, ALT) item, items are hashed and the <sketch_size> smallest hashes are kept.
+    Two sketches can be compared with <sketch_similarity> to estimate how similar two replicates are.
+
+    :param dict vcf_dict:       A replicate (see <load_vcf_positions>). Lines need an "ALT".
+    :param int sketch_size:     Number of hashes kept. The greater it is, the better estimations are.
+    :param int bin_size:        Positions are divided by this number : close positions end up inside the same bin.
+    :return list[int]: Sorted hashes of the sketch.
+    """
+    return heapq.nsmallest(sketch_size, _sketch_hashes(vcf_dict, bin_size=bin_size))
+
+
+def _sketch_hashes(vcf_dict: dict, bin_size: int = 1) -> set[int]:
+    """Internal function. Hashes of all distinct (chromosome, binned position, ALT) items of a replicate
+    (see <sketch_positions>).
+
+    :param dict vcf_dict:   A replicate (see <load_vcf_positions>). Lines need an "ALT".
+    :param int bin_size:    Positions are divided by this number.
+    :return set[int]: Hashes of items.
+    """
+    hashes = set()
+    for chrom, position in vcf_dict:
+        for line in vcf_dict[(chrom, position)]:
+            item = f"{chrom}\t{position // bin_size}\t{line['ALT']}".encode()
+            hashes.add(int.from_bytes(hashlib.blake2b(item, digest_size=8).digest(), "little"))
+    return hashes
+
+
+def sketch_similarity(main_sketch: list[int], second_sketch: list[int], sketch_size: int = 256) -> float:
+    """Estimate the Jaccard index of two replicates using their sketches (see <sketch_positions>).
+
+    :param list main_sketch:    Sketch of the first replicate.
+    :param list second_sketch:  Sketch of the second replicate.
+    :param int sketch_size:     Size used to build sketches.
+    :return float: Estimated Jaccard index (between 0 and 1).
+    """
+    main_hashes = set(main_sketch)
+    second_hashes = set(second_sketch)
+    union = heapq.nsmallest(sketch_size, main_hashes | second_hashes)
+    if len(union) == 0:
+        return 1
+    shared = sum(1 for hash_ in union if hash_ in main_hashes and hash_ in second_hashes)
+    return shared / len(union)
+
+
+def compare_replicat_sketch(offset: int = 0, sequence_threshold: float = None, sketch_size: int = 256,
+                            exact_margin: float = None, quiet: bool = True, **replicates) -> dict:
+    """Fast version of <compare_replicat> that only estimate scores of replicates comparisons using MinHash
+    sketches (see <sketch_positions>). Positions are binned using <offset> + 1 and sequences are compared as if
+    <sequence_threshold> was None. Number of matches (GF, IF) are estimated from the Jaccard index of each couple.
+
+    Estimated couples can be checked : couples with an estimated global score that is at least <exact_margin> points
+    away from the mean of estimated global scores (aberrant or borderline replicates) are compared again using
+    <compare_pair>.
+
+    :param int offset:          How close the position should be to be compared to each-others.
+    :param float sequence_threshold: How similar two sequences must be to consider them as identical. Only used for
+                                    exact comparisons.
+    :param int sketch_size:     Number of hashes kept for each replicate.
+    :param float exact_margin:  If not None, couples with a score at least <exact_margin> points away from the mean
+                                    score are compared exactly.
+    :param bool quiet:          If False, the number of exact comparisons is printed.
+    :param replicates: At least two replicates. replicates names can not be '__MEANS__'.
+        replicate_name=replicate_dict.
+    :return dict: See <score_dict> in <compare_replicat>.
+    """
+    # Some verification
+    if len(replicates) < 2:
+        raise ValueError("Not enough replicate provided. At least two replicate are expected.")
+    if "__MEANS__" in replicates:
+        raise NameError("Can not compute replicates with '__MEANS__' as name.")
+    if (sequence_threshold is not None) and (not 0 <= sequence_threshold <= 100):
+        raise ValueError("<sequence_threshold> should be None or a number "
+                         "greater or equal to 0 and lower or equal to 100")
+    if sketch_size < 1:
+        raise ValueError(f"<sketch_size> is expected to be greater or equal to 1. Got : {sketch_size}")
+    if offset < 0:
+        offset = 0
+
+    number_of_replicates = len(replicates)
+    # The Jaccard index is about distinct items : duplicated lines (same position and ALT, or same bin) are not
+    # counted twice, otherwise estimated scores are too low.
+    replicates_list = []
+    for dict_name, dic_ in replicates.items():
+        hashes = _sketch_hashes(dic_, bin_size=offset + 1)
+        replicates_list.append((dict_name, dic_, len(dic_), len(hashes), heapq.nsmallest(sketch_size, hashes)))
+
+    # Estimate number of matches for each couple. Couples follow the order of <compare_replicat>.
+    couples = [(i, j) for i in range(0, number_of_replicates) for j in range(i + 1, number_of_replicates)]
+    estimations = []
+    for i, j in couples:
+        _, _, main_length, main_items, main_sketch = replicates_list[i]
+        _, _, second_length, second_items, second_sketch = replicates_list[j]
+
+        jaccard = sketch_similarity(main_sketch, second_sketch, sketch_size=sketch_size)
+        shared_items = jaccard * (main_items + second_items) / (1 + jaccard)
+        main_matches = round(min(1, shared_items / main_items) * main_length) if main_items else 0
+        second_matches = round(min(1, shared_items / second_items) * second_length) if second_items else 0
+        global_score = (main_matches + second_matches) / (main_length + second_length) * 100 if (
+            main_length + second_length) else 100
+        estimations.append([main_matches, second_matches, global_score])
+
+    # Compare exactly couples that are far from the mean.
+    if exact_margin is not None:
+        mean_score = sum(estimation[2] for estimation in estimations) / len(estimations)
+        number_of_exact = 0
+
+        for (i, j), estimation in zip(couples, estimations):
+            if abs(estimation[2] - mean_score) < exact_margin:
+                continue
+            main_match, second_match = compare_pair(replicates_list[i][0], replicates_list[i][1],
+                                                    replicates_list[j][0], replicates_list[j][1],
+                                                    offset=offset, sequence_threshold=sequence_threshold)
+            estimation[0], estimation[1] = len(main_match), len(second_match)
+            number_of_exact += 1
+
+        if not quiet: print(f"{number_of_exact} / {len(estimations)} couple(s) compared exactly.")
+
+    # Save scores.
+    score_dict = {"__MEANS__": {"__MEANS__": [0]}}
+    for (i, j), (main_matches, second_matches, _) in zip(couples, estimations):
+        save_pair_scores(score_dict, replicates_list[i][0], replicates_list[i][2], main_matches,
+                         replicates_list[j][0], replicates_list[j][2], second_matches, number_of_replicates)
+
+    return score_dict
+
+
+def compare_replicat_matrix(offset: int = 0, sequence_threshold: float = None, quiet: bool = True,
+                            structural_overlap: float = None, blocked: bool = False, **replicates) -> dict:
+    """Same comparisons as <compare_replicat>, but scores are stored inside NumPy matrices (one row and one column
+    per replicate) instead of dictionaries. Positions are not summarized. Require NumPy.
+
+    Let i and j two replicates (names[i] and names[j]) :
+        - GSCORE[i, j], GF[i, j], GM[i, j] : global score of i and j (symmetric).
+        - ISCORE[i, j], IF[i, j], IM[i, j] : inclusion of i inside j.
+    These are the values of score_dict[names[i]][names[j]] (see <compare_replicat>). The diagonal is filled as if
+    replicates were compared with themselves (scores of 100).
+
+    :param replicates: At least two replicates (see <compare_replicat>).
+    (See <compare_replicat> for other arguments)
+    :return dict: {"names": [replicates names], "GSCORE": float matrix, "GF": int matrix, "GM": int matrix,
+                   "ISCORE": float matrix, "IF": int matrix, "IM": int matrix}
+    """
+    numpy = _import_numpy()
+
+    # Some verification
+    if len(replicates) < 2:
+        raise ValueError("Not enough replicate provided. At least two replicate are expected.")
+    if (sequence_threshold is not None) and (not 0 <= sequence_threshold <= 100):
+        raise ValueError("<sequence_threshold> should be None or a number "
+                         "greater or equal to 0 and lower or equal to 100")
+    if (structural_overlap is not None) and (not 0 <= structural_overlap <= 100):
+        raise ValueError("<structural_overlap> should be None or a number "
+                         "greater or equal to 0 and lower or equal to 100")
+    if offset < 0:
+        offset = 0
+
+    names = list(replicates)
+    dicts = list(replicates.values())
+    number_of_replicates = len(names)
+    lengths = numpy.array([len(dic_) for dic_ in dicts], dtype=numpy.int64)
+
+    # Counts are filled by comparisons, scores are computed at the end.
+    global_found = numpy.zeros((number_of_replicates, number_of_replicates), dtype=numpy.int64)
+    inclusion_found = numpy.zeros((number_of_replicates, number_of_replicates), dtype=numpy.int64)
+    comparison_errors = []
+
+    structures = [None] * number_of_replicates
+    if structural_overlap is not None:
+        structures = [structural_intervals(dic_) for dic_ in dicts]
+    blocks = [None] * number_of_replicates
+    if blocked:
+        blocks = [position_blocks(dic_, offset + 1) for dic_ in dicts]
+
+    for i in range(0, number_of_replicates - 1):
+        for j in range(i + 1, number_of_replicates):
+            main_match, second_match = compare_pair(names[i], dicts[i], names[j], dicts[j], offset=offset,
+                                                    sequence_threshold=sequence_threshold,
+                                                    comparison_errors=None if quiet else comparison_errors,
+                                                    structural_overlap=structural_overlap,
+                                                    main_structures=structures[i], second_structures=structures[j],
+                                                    blocked=blocked, second_blocks=blocks[j])
+            inclusion_found[i, j] = len(main_match)
+            inclusion_found[j, i] = len(second_match)
+            global_found[i, j] = global_found[j, i] = len(main_match) + len(second_match)
+
+    # A replicate compared with itself.
+    numpy.fill_diagonal(inclusion_found, lengths)
+    numpy.fill_diagonal(global_found, 2 * lengths)
+
+    global_max = lengths[:, None] + lengths[None, :]
+    inclusion_max = numpy.repeat(lengths[:, None], number_of_replicates, axis=1)
+
+    # Same rounding as <save_pair_scores> : empty replicates have scores of 100.
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        global_score = numpy.where(global_max > 0, numpy.round(global_found / global_max * 100, 2), 100.0)
+        inclusion_score = numpy.where(inclusion_max > 0, numpy.round(inclusion_found / inclusion_max * 100, 2),
+                                      100.0)
+
+    if not quiet:
+        for items in comparison_errors:
+            # Show problematics lines
+            print(items)
+
+    return {"names": names, "GSCORE": global_score, "GF": global_found, "GM": global_max,
+            "ISCORE": inclusion_score, "IF": inclusion_found, "IM": inclusion_max}
+
+
+def export_matrices(matrices: dict, path: str, score: str = "GSCORE"):
+    """Save matrices made by <compare_replicat_matrix>. Require NumPy.
+        - '.npz' : all matrices and names are saved (numpy.load(path) give them back).
+        - Other extensions : the matrix <score> is saved as a tabulated table with names as first row and first
+            column (readable by most clustering and heatmap tools).
+
+    :param dict matrices:   Result of <compare_replicat_matrix>.
+    :param str path:        A path toward the output file.
+    :param str score:       Matrix saved inside a table ("GSCORE", "GF", "GM", "ISCORE", "IF" or "IM").
+    """
+    numpy = _import_numpy()
+
+    if path.endswith(".npz"):
+        numpy.savez(path, **{key: (numpy.array(value) if key == "names" else value)
+                             for key, value in matrices.items()})
+        return
+
+    if score not in matrices or score == "names":
+        raise ValueError(f"<score> is expected to be 'GSCORE', 'GF', 'GM', 'ISCORE', 'IF' or 'IM'. Got : {score}")
+
+    names = matrices["names"]
+    values = matrices[score]
+    with open(path, "w") as file:
+        file.write("\t".join([score] + names) + "\n")
+        for name, row in zip(names, values):
+            file.write(name + "\t" + "\t".join(map(str, row.tolist())) + "\n")
+
+
+def _import_numpy():
+    """Internal function. Import NumPy only when a function that need it is called.
+
+    :return: The numpy module.
+    """
+    try:
+        import numpy
+    except ImportError as E:
+        raise ImportError("NumPy is required by <compare_replicat_matrix> and <export_matrices> "
+                          "(pip install numpy).") from E
+    return numpy
+
+
+def build_position_index(path: str, index_path: str = None) -> str:
+    """Build a position index of a variant call format file. This index can be used by <compare_against> to compare
+    new files with this file without loading it again.
+
+    An index is a binary file : INDEX_MAGIC, the length of a JSON header (8 bytes, little endian), the JSON header
+    (path, size and modification time of the indexed file, chromosomes, alterations and numbers of positions and
+    records) and records.
+    Records are (chromosome id, position, alteration id) packed with INDEX_RECORD and sorted : they can be searched
+    without being loaded (see <compare_against>).
+
+    :param str path:        A path toward a variant call format file.
+    :param str index_path:  Where the index is saved. If None, INDEX_EXTENSION is added to <path>.
+    :return str: <index_path>
+    """
+    if index_path is None:
+        index_path = path + INDEX_EXTENSION
+
+    # Taken before loading : a file modified while it is loaded makes a stale index.
+    file_stat = os.stat(path)
+    vcf_dict = load_vcf_positions(path, all_=False, alt=True)
+    chroms = sorted({chrom for chrom, _ in vcf_dict})
+    alts = sorted({line["ALT"] for lines in vcf_dict.values() for line in lines})
+    chrom_ids = {chrom: i for i, chrom in enumerate(chroms)}
+    alt_ids = {alt: i for i, alt in enumerate(alts)}
+
+    records = sorted((chrom_ids[chrom], position, alt_ids[line["ALT"]])
+                     for (chrom, position), lines in vcf_dict.items() for line in lines)
+    header = json.dumps({"path": path, "size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns,
+                         "chroms": chroms, "alts": alts, "positions": len(vcf_dict), "records": len(records),
+                         "CVersion": __version__}).encode()
+
+    # Write next to <index_path> and rename : an index is either complete or missing.
+    temporary_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(temporary_path, mode="wb") as file:
+        file.write(INDEX_MAGIC)
+        file.write(len(header).to_bytes(8, "little"))
+        file.write(header)
+        packer = struct.Struct(INDEX_RECORD)
+        for record in records:
+            file.write(packer.pack(*record))
+    os.replace(temporary_path, index_path)
+
+    return index_path
+
+
+def compare_against(index_paths: list[str], new_file, offset: int = 0, sequence_threshold: float = None) -> dict:
+    """Compare a file with files indexed by <build_position_index>. Indexed files are not loaded : indexes are
+    memory-mapped and only positions close to positions of <new_file> are read.
+    Results are the same as the ones of <compare_replicat> for <new_file>. A ValueError is raised if an indexed file
+    still exists but changed since its index was built.
+
+    :param list index_paths:        Paths toward indexes (see <build_position_index>).
+    :param new_file:                A path toward a variant call format file or a replicate loaded by
+                                        <load_vcf_positions>.
+    :param int offset:              How close the position should be to be compared to each-others.
+    :param float sequence_threshold: How similar two sequences must be to consider them as identical.
+                                        If None, sequences has to be the same.
+    :return dict: {"<indexed file>": (global score, number of global match, maximum match number, inclusion score
+                    (of <new_file> in <indexed file>), number of inclusion match, maximum inclusion match number)}.
+                    Same as score_dict[<new_file>] in <compare_replicat>.
+    """
+    if (sequence_threshold is not None) and (not 0 <= sequence_threshold <= 100):
+        raise ValueError("<sequence_threshold> should be None or a number "
+                         "greater or equal to 0 and lower or equal to 100")
+    if offset < 0:
+        offset = 0
+
+    new_dict = load_vcf_positions(new_file, all_=False, alt=True) if isinstance(new_file, str) else new_file
+    new_name = new_file if isinstance(new_file, str) else "__NEW__"
+    packer = struct.Struct(INDEX_RECORD)
+
+    rows = {}
+    for index_path in index_paths:
+        with open(index_path, mode="rb") as file:
+            if file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"This file is not an index made by <build_position_index> : {index_path}")
+            header_length = int.from_bytes(file.read(8), "little")
+            header = json.loads(file.read(header_length))
+            if os.path.exists(header["path"]):
+                file_stat = os.stat(header["path"])
+                if (file_stat.st_size, file_stat.st_mtime_ns) != (header.get("size"), header.get("mtime_ns")):
+                    raise ValueError(f"{header['path']} changed since {index_path} was built. "
+                                     f"Build this index again (see <build_position_index>).")
+            data_start = len(INDEX_MAGIC) + 8 + header_length
+
+            index_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if header["records"] else b""
+
+        chrom_ids = {chrom: i for i, chrom in enumerate(header["chroms"])}
+        alts = header["alts"]
+        number_of_records = header["records"]
+
+        def record(i):
+            return packer.unpack_from(index_map, data_start + i * packer.size)
+
+        new_match = set()
+        indexed_match = set()
+        for initial_pos in new_dict:
+            chrom, position = initial_pos
+            if chrom not in chrom_ids:
+                continue
+            chrom_id = chrom_ids[chrom]
+
+            # Binary search of the first record inside [position - offset ; position + offset].
+            low, high = 0, number_of_records
+            while low < high:
+                middle = (low + high) // 2
+                if record(middle)[0:2] < (chrom_id, position - offset):
+                    low = middle + 1
+                else:
+                    high = middle
+
+            # Records are sorted : gather alterations of each position of the window.
+            window = {}
+            while low < number_of_records:
+                record_chrom, record_position, alt_id = record(low)
+                if record_chrom != chrom_id or record_position > position + offset:
+                    break
+                window.setdefault(record_position, []).append({"ALT": alts[alt_id]})
+                low += 1
+
+            for record_position, indexed_lines in window.items():
+                try:
+                    results = _compare_position_alt(new_dict[initial_pos], indexed_lines,
+                                                    sequence_threshold=sequence_threshold)
+                except KeyError:
+                    # Same as <compare_pair> : positions that can not be compared do not match.
+                    continue
+
+                if results:
+                    new_match.add(initial_pos)
+                    indexed_match.add((chrom, record_position))
+
+        if isinstance(index_map, mmap.mmap):
+            index_map.close()
+
+        # Use the same formulas as <compare_replicat>.
+        score_dict = {"__MEANS__": {"__MEANS__": [0]}}
+        save_pair_scores(score_dict, new_name, len(new_dict), len(new_match),
+                         header["path"], header["positions"], len(indexed_match), 2)
+        rows[header["path"]] = score_dict[new_name][header["path"]]
+
+    return rows
+
+
+def _compare_position_alt(main_items: list, second_items: list, sequence_threshold: float = None,
+                          skip_structural: bool = False):
     """Compare two list of alteration to say if at least one item of <main_items> match with at least one item inside
     <second_items>.
 
@@ -445,6 +1385,8 @@ def _compare_position_alt(main_items: list, second_items: list, sequence_thresho
     :param list[dict] second_items:    Another list of lines from a vcf file (dictionaries with "ALT" inside)
     :param float sequence_threshold:  How similar two sequences must be to consider them identical.
                                       If None, sequences has to be the same.
+    :param bool skip_structural:    If True, "<DEL>", "<INS>" and "<DUP>" never match (they are compared by
+                                      <compare_pair> using their spans).
     :return list: a list of all match that as occurred between <main_items> and <second_items>.
     """
     matches = []
@@ -461,7 +1403,10 @@ def _compare_position_alt(main_items: list, second_items: list, sequence_thresho
             second_alt = second_variations["ALT"]
 
             # Comparison
-            if alt in ("<DEL>", "<INS>", "<DUP>", "H") or second_alt in ("<DEL>", "<INS>", "<DUP>", "H"): # (1)
+            if skip_structural and (alt in STRUCTURAL_ALTERATIONS or second_alt in STRUCTURAL_ALTERATIONS):
+                pass
+
+            elif alt in ("<DEL>", "<INS>", "<DUP>", "H") or second_alt in ("<DEL>", "<INS>", "<DUP>", "H"): # (1)
                 if alt == second_alt:
                     matches.append(alt)
 
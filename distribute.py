@@ -0,0 +1,351 @@
+# encoding=utf-8
+"""This file split the work done by <scan.main> into work units that can be handled by any number of workers, on one
+or more computers. Work units are stored inside a shared folder (the queue). Nothing else is required : workers only
+need to access this folder and .vcf files.
+
+A run is made of three steps :
+    1 - <prepare> : .vcf files are indexed and grouped as <scan.main> would do. Couples of files of each group are
+        split into work units written inside the queue.
+    2 - <work> : A worker claim a work unit (a unit is claimed by renaming it, which can only succeed once), compare
+        couples of files of this unit and write a shard with partial results. Start as many workers as needed.
+    3 - <reduce> : Shards are merged and the report of <scan.main> is rebuilt.
+
+Queue layout :
+    plan.json       Settings and groups made by <prepare>.
+    units/          Work units waiting for a worker.
+    claimed/        Work units currently handled by a worker.
+    shards/         Results of completed work units.
+
+If you decide to call this file from Bash, here a list of accepted arguments :
+    prepare <queue> <folder_path> <separator> <offset> <threshold> <open_files> <quiet> <output_file> <output_type>
+            <complete_names> <pairs_per_unit>     (see <prepare> and <scan.main>)
+    work <queue> <quiet>
+    requeue <queue>
+    reduce <queue> <quiet>
+"""
+
+__author__ = "Marchal Florent"
+__copyright__ = "Copyright 2023, Marchal Florent"
+__credits__ = ["Marchal Florent", " Fiston-Lavier Anna-Sophie"]
+__license__ = "CC-BY-SA-4.0"
+__version__ = "1.0.2"
+__maintainer__ = "Marchal Florent"
+__email__ = "flo.marchal2002@gmail.com"
+__status__ = "Production"
+
+
+import os
+import sys
+import json
+import socket
+import compare
+import scan
+
+
+PLAN_NAME = "plan.json"
+UNITS_FOLDER = "units"
+CLAIMED_FOLDER = "claimed"
+SHARDS_FOLDER = "shards"
+
+
+def prepare(queue: str, path: str, separator: str = "", offset: int = 0, threshold: float = None,
+            open_files: bool = True, quiet: bool = True, output_file: str = None, output_type: str = "position",
+            complete_names: bool = False, pairs_per_unit: int = 0) -> int:
+    """Index and group .vcf files (see <scan.index_groups>) and write work units inside <queue>.
+    See <scan.main> for arguments shared with <scan.main>.
+
+    :param str queue:           A path toward an empty (or missing) folder shared by all workers.
+    :param int pairs_per_unit:  Number of couples of files inside a work unit. If 0, each group is a work unit.
+    :return int: Number of work units written.
+    """
+    # Make some verification
+    if not os.path.isdir(path):
+        raise NameError(f"Directory expected for <path>. Got : {path}")
+    if os.path.exists(queue) and (not os.path.isdir(queue) or len(os.listdir(queue)) != 0):
+        raise NameError(f"Empty directory expected for <queue>. Got : {queue}")
+    if output_type not in ("file", "both", "position"):
+        raise ValueError(f"<output_type> is expected to be 'file', 'both' or 'position'. Got : {output_type}")
+    if (threshold is not None) and (not 0 <= threshold <= 100):
+        raise ValueError("<threshold> should be None or a number greater or equal to 0 and lower or equal to 100")
+    if pairs_per_unit < 0:
+        raise ValueError(f"<pairs_per_unit> is expected to be greater or equal to 0. Got : {pairs_per_unit}")
+    if output_file is not None:
+        if os.path.isdir(output_file):
+            raise NameError(f"File expected for <output_file>. Got : {output_file}")
+        if output_file.split(".")[-1] != "txt":
+            output_file += ".txt"
+
+    for folder in (UNITS_FOLDER, CLAIMED_FOLDER, SHARDS_FOLDER):
+        os.makedirs(os.path.join(queue, folder), exist_ok=True)
+
+    # Groups are made once : workers and <reduce> use the exact same groups.
+    grouped_files = scan.index_groups(path, separator=separator, open_files=open_files, quiet=quiet)
+    plan = {
+        "settings": {"offset": offset, "threshold": threshold, "output_file": output_file,
+                     "output_type": output_type, "complete_names": complete_names},
+        "str_settings": scan.settings_string(path, separator, offset, threshold, open_files, quiet, output_file,
+                                             complete_names, output_type),
+        "groups": list(grouped_files.items()),
+    }
+    _atomic_write(os.path.join(queue, PLAN_NAME), json.dumps(plan).encode())
+
+    # Split couples of files into work units. Units are named so that sorting them follow the order of
+    # <compare.compare_replicat>.
+    number_of_units = 0
+    for group_index, (groups_name, list_of_files) in enumerate(grouped_files.items()):
+        pairs = [(i, j) for i in range(0, len(list_of_files)) for j in range(i + 1, len(list_of_files))]
+        chunk_size = pairs_per_unit if pairs_per_unit > 0 else max(1, len(pairs))
+
+        for chunk_index, start in enumerate(range(0, len(pairs), chunk_size)):
+            unit = {"group": group_index, "pairs": pairs[start:start + chunk_size]}
+            unit_name = f"{group_index:08d}-{chunk_index:08d}.unit"
+            _atomic_write(os.path.join(queue, UNITS_FOLDER, unit_name), json.dumps(unit).encode())
+            number_of_units += 1
+
+    if not quiet: print(f"{number_of_units} work units written inside {queue}.")
+    return number_of_units
+
+
+def work(queue: str, quiet: bool = True) -> int:
+    """Claim and complete work units of <queue> until no unit is left. Any number of workers can run at the same
+    time, on any computer that can access <queue>.
+
+    :param str queue:   A folder prepared by <prepare>.
+    :param bool quiet:  If False, completed units are printed.
+    :return int: Number of work units completed by this worker.
+    """
+    plan = _read_plan(queue)
+    offset = max(0, plan["settings"]["offset"])
+    threshold = plan["settings"]["threshold"]
+    worker_name = f"{socket.gethostname()}.{os.getpid()}"
+
+    # Files of the last group are kept in memory : consecutive units of a group do not reload them.
+    cache_group = None
+    cache = {}
+
+    number_of_units = 0
+    while (claimed := _claim_unit(queue, worker_name)) is not None:
+        unit_name, claimed_path = claimed
+        with open(claimed_path) as file:
+            unit = json.load(file)
+
+        groups_name, list_of_files = plan["groups"][unit["group"]]
+        if cache_group != unit["group"]:
+            cache_group = unit["group"]
+            cache = {}
+
+        shard = {"group": unit["group"], "pairs": [], "failed": [], "positions": {}}
+        for i, j in unit["pairs"]:
+            # Load files of this couple. Files that can not be loaded are reported to <reduce>.
+            for index in (i, j):
+                if index not in cache:
+                    cache[index] = scan.load_group([list_of_files[index]], quiet=quiet).get(list_of_files[index])
+                    if cache[index] is None:
+                        shard["failed"].append(index)
+            if cache[i] is None or cache[j] is None:
+                continue
+
+            main_match, second_match = compare.compare_pair(list_of_files[i], cache[i], list_of_files[j], cache[j],
+                                                            offset=offset, sequence_threshold=threshold,
+                                                            positions_dict=shard["positions"],
+                                                            number_of_replicates=0)
+            shard["pairs"].append((i, j, len(cache[i]), len(cache[j]), len(main_match), len(second_match)))
+
+        # Shards are JSON, as plans and units : reading a shard can not run code. Positions are [chrom, pos, found,
+        # alterations].
+        shard["positions"] = [[chrom, position, sorted(found), alterations]
+                              for (chrom, position), (found, _, alterations) in shard["positions"].items()]
+        _atomic_write(os.path.join(queue, SHARDS_FOLDER, unit_name[:-len(".unit")] + ".shard"),
+                      json.dumps(shard).encode())
+        os.remove(claimed_path)
+        number_of_units += 1
+        if not quiet: print(f"Unit {unit_name} ('{groups_name}') done by {worker_name}.")
+
+    return number_of_units
+
+
+def requeue(queue: str) -> int:
+    """Put back inside the queue units claimed by workers that died before completing them. Only call this function
+    when no worker is running.
+
+    :param str queue:   A folder prepared by <prepare>.
+    :return int: Number of work units put back.
+    """
+    number_of_units = 0
+    for claimed_name in os.listdir(os.path.join(queue, CLAIMED_FOLDER)):
+        # Claimed units are named '{unit_name}.{worker_name}'.
+        unit_name = claimed_name[:claimed_name.index(".unit") + len(".unit")]
+        os.rename(os.path.join(queue, CLAIMED_FOLDER, claimed_name), os.path.join(queue, UNITS_FOLDER, unit_name))
+        number_of_units += 1
+    return number_of_units
+
+
+def reduce(queue: str, quiet: bool = True):
+    """Merge shards of a completed queue and output the same report as <scan.main>.
+
+    :param str queue:   A folder prepared by <prepare> where all work units are completed.
+    :param bool quiet:  If False, information about groups are printed.
+    """
+    plan = _read_plan(queue)
+    settings = plan["settings"]
+    output_file = settings["output_file"]
+
+    remaining = len(os.listdir(os.path.join(queue, UNITS_FOLDER))) + len(os.listdir(os.path.join(queue,
+                                                                                                    CLAIMED_FOLDER)))
+    if remaining != 0:
+        raise ValueError(f"Can not reduce '{queue}' : {remaining} work unit(s) are not completed.")
+
+    # Shards are sorted by group and by couples of files.
+    shards_per_group = {}
+    for shard_name in sorted(os.listdir(os.path.join(queue, SHARDS_FOLDER))):
+        with open(os.path.join(queue, SHARDS_FOLDER, shard_name)) as file:
+            shard = json.load(file)
+        if shard["group"] not in shards_per_group:
+            shards_per_group[shard["group"]] = [shard]
+        else:
+            shards_per_group[shard["group"]].append(shard)
+
+    if output_file:
+        with open(output_file, mode="w") as file:
+            # Create a file named <output_file>.
+            pass
+
+    for group_index, (groups_name, list_of_files) in enumerate(plan["groups"]):
+        if group_index not in shards_per_group:
+            if not quiet: print(f"'{groups_name}' group is too small : {len(list_of_files)} item(s) / {2}.")
+            continue
+        shards = shards_per_group[group_index]
+
+        # Files that can not be loaded are removed from the group, as <scan.main> would do.
+        failed = set()
+        for shard in shards:
+            failed.update(shard["failed"])
+        number_of_replicates = len(list_of_files) - len(failed)
+        if number_of_replicates < 2:
+            if not quiet: print(f"Can not use '{groups_name}'. Not enough file can be loaded.")
+            continue
+
+        # Rebuild results of <compare.compare_replicat> in its own order.
+        score_dict = {"__MEANS__": {"__MEANS__": [0]}}
+        positions_dict = {}
+        for shard in shards:
+            for i, j, main_length, second_length, main_matches, second_matches in shard["pairs"]:
+                compare.save_pair_scores(score_dict, list_of_files[i], main_length, main_matches,
+                                         list_of_files[j], second_length, second_matches, number_of_replicates)
+
+            for chrom, pos, found, alterations in shard["positions"]:
+                position = (chrom, pos)
+                if position not in positions_dict:
+                    positions_dict[position] = [set(), number_of_replicates, {}]
+                positions_dict[position][0].update(found)
+                merged_alterations = positions_dict[position][2]
+                for alt, occurrences in alterations.items():
+                    merged_alterations[alt] = merged_alterations.get(alt, 0) + occurrences
+
+        paragraph = scan.group_paragraph(groups_name, score_dict, positions_dict, plan["str_settings"],
+                                         output_type=settings["output_type"],
+                                         complete_names=settings["complete_names"])
+        scan.output_paragraph(paragraph, output_file, quiet=quiet)
+
+
+def _claim_unit(queue: str, worker_name: str) -> tuple:
+    """Internal function. Claim the first available work unit of <queue>. A unit is claimed by moving it inside
+    the claimed folder : only one worker can succeed.
+
+    :param str queue:       A folder prepared by <prepare>.
+    :param str worker_name: A name unique to this worker.
+    :return tuple: (name of the unit, path toward the claimed unit) or None if no unit is available.
+    """
+    units_folder = os.path.join(queue, UNITS_FOLDER)
+    for unit_name in sorted(os.listdir(units_folder)):
+        claimed_path = os.path.join(queue, CLAIMED_FOLDER, f"{unit_name}.{worker_name}")
+        try:
+            os.rename(os.path.join(units_folder, unit_name), claimed_path)
+        except FileNotFoundError:
+            # Another worker has been faster.
+            continue
+        return unit_name, claimed_path
+    return None
+
+
+def _read_plan(queue: str) -> dict:
+    """Internal function. Load the plan written by <prepare>.
+
+    :param str queue:   A folder prepared by <prepare>.
+    :return dict: The plan of <queue>.
+    """
+    plan_path = os.path.join(queue, PLAN_NAME)
+    if not os.path.isfile(plan_path):
+        raise NameError(f"Folder prepared by <prepare> expected for <queue>. Got : {queue}")
+    with open(plan_path) as file:
+        return json.load(file)
+
+
+def _atomic_write(path: str, content: bytes):
+    """Internal function. Write <content> inside <path>. The file is written next to <path> and then renamed : other
+    workers either see nothing or see the complete file.
+
+    :param str path:        Path of the file.
+    :param bytes content:   Content of the file.
+    """
+    temporary_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(temporary_path, mode="wb") as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+if __name__ == "__main__":  # If this file isn't an import.
+    sys_args = sys.argv[1:]
+    args_length = len(sys_args)
+
+    if args_length < 2 or sys_args[0] not in ("prepare", "work", "requeue", "reduce"):
+        print(__doc__)
+        sys.exit(1)
+    command, main_queue = sys_args[0], sys_args[1]
+
+    if command == "prepare":
+        # Arguments follow the order used by scan.py, with <queue> first and <pairs_per_unit> at the end.
+        if args_length < 3:
+            raise ValueError("A path toward a folder is expected after <queue>.")
+        main_path = sys_args[2]
+        main_separator = sys_args[3] if args_length >= 4 and sys_args[3] != "none" else ""
+
+        try:
+            main_offset = int(sys_args[4]) if args_length >= 5 else 0
+        except ValueError:
+            raise ValueError(f"Integer expected for the 'offset' option. Got : {sys_args[4]}")
+
+        try:
+            main_threshold = float(sys_args[5]) if args_length >= 6 and sys_args[5] != "none" else None
+        except ValueError:
+            raise ValueError(f"Float expected for the 'threshold' option. Got : {sys_args[5]}")
+
+        main_open_files = sys_args[6] in ("true", "1", "y") if args_length >= 7 else True
+        main_quiet = args_length >= 8 and sys_args[7] in ("true", "1", "y")
+        main_output = sys_args[8] if args_length >= 9 and sys_args[8] != "none" else None
+        if args_length >= 10 and sys_args[9] in ("file", "both", "position"):
+            main_output_type = sys_args[9]
+        else:
+            main_output_type = "position"
+        main_complete_names = args_length >= 11 and sys_args[10] in ("true", "1", "y")
+
+        try:
+            main_pairs_per_unit = int(sys_args[11]) if args_length >= 12 else 0
+        except ValueError:
+            raise ValueError(f"Integer expected for the 'pairs_per_unit' option. Got : {sys_args[11]}")
+
+        prepare(main_queue, main_path, separator=main_separator, offset=main_offset, threshold=main_threshold,
+                open_files=main_open_files, quiet=main_quiet, output_file=main_output,
+                output_type=main_output_type, complete_names=main_complete_names,
+                pairs_per_unit=main_pairs_per_unit)
+
+    elif command == "work":
+        work(main_queue, quiet=args_length >= 3 and sys_args[2] in ("true", "1", "y"))
+
+    elif command == "requeue":
+        print(f"{requeue(main_queue)} work unit(s) put back.")
+
+    else:
+        reduce(main_queue, quiet=args_length >= 3 and sys_args[2] in ("true", "1", "y"))
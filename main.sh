@@ -17,15 +17,16 @@ This program will help you to:
 This file use two python files (scan.py and compare.py) to seek, group and compare .vcf files.
 A percentage is assigned to each group of vcf files. This score represent how similar files are inside this group.
 
-/!\\ Does not support multi-samples files. /!\\
+Multi-samples files are skipped unless -m is used.
 
 Options :
 - h) Return the help of main.sh.
-- d) By default, files are opened during the search to verify that they are variant call format and not Vcard files. This also exclude multiple sample files (which are not supported). Use this option to turn it off.
+- d) By default, files are opened during the search to verify that they are variant call format and not Vcard files. This also exclude multiple sample files (unless -m is used). Use this option to turn it off.
 - v) This program will display information during the process (file found, handled errors, progress bar...).
 - g) This program will only return Files comparison. If let unspecified (and b unspecified too), Variants summarization is returned.
 - b) This program will return both Files comparison score and Variants summarization.
 - c) Show files with their complete path.
+- m) Use files with multiple samples. Each sample is compared as if it was a file of the group (named 'file:sample'). A sample carries a variant when its genotype (GT) contains an alternative allele.
 
 - p) A path to folder. All files inside this folder, its sub-folders, its sub-sub-folder and so on will be passed in review. All .vcf files are used by this program. If let unspecified, ‘~’ is used.
 - s) A Separator that will be used to group files (can not be 'none'). If unspecified parent folder will be used to group files. Here an example with “-” as a separator:
@@ -37,6 +38,16 @@ Options :
 - o) How close two position should be to be compared to each-others. By default 0 is used. Positions that match together due to the offset gain half a similarity point. Offset can not cross chromosomes.
 - t) Integer between 0 and 100. When two sequences are compared, they must have an alignment score greater or equal to this threshold to be considered identical. If threshold is unspecified, two sequences are considered similar if they are identical.
 - r) A path toward a file. Result of these comparisons will be stored inside this file. If a file allready exist, this file will be overwrite. If unspecified result will be printed inside the console.
+- P) A path toward a folder. Loading and comparison of each group are profiled (cProfile). A .pstats file is saved inside this folder for each group and each step and the most expensive functions are displayed. Profiled steps are never run at the same time (-w). If unspecified, nothing is profiled.
+- w) A positive integer. Groups are loaded, compared and written at the same time (the next group is loaded while the current one is compared). No more than this number of groups are held in memory at the same time. Results keep the same order. If unspecified (or 0), groups are handled one by one.
+- j) A positive integer. Number of processes used to handle groups. Most expensive groups (size of files x number of comparisons) are handled first. Results keep the same order. Can not be used with -w. If unspecified, 1 is used.
+- k) Resume a previous run that has been stopped. Requires -r. Completed groups are recorded inside '<output_file>.journal'. With this option, groups completed by a previous run made with the same settings are skipped and missing groups are added to the output file. Without this option the output file and its journal are overwritten.
+- a) A positive integer. Files comparison only (-g). Scores are estimated using MinHash sketches of this size instead of comparing each position. Positions are binned using the offset (-o) and sequences are compared as if -t was unspecified. Much faster for large groups. If unspecified (or 0), scores are exact.
+- A) A number. With -a, couples of files with an estimated GSCORE at least this number of points away from the mean GSCORE of their group (aberrant or borderline replicates) are compared exactly.
+- S) A number between 0 and 100. Structural variants (DEL, INS, DUP) are compared using their spans (END or SVLEN inside INFO) instead of the offset (-o). Two structural variants of the same type are similar when they overlap each other by at least this percent of their lengths (reciprocal overlap). If unspecified, structural variants are compared as other positions.
+- B) Positions of files are sorted by blocks of (offset + 1) bases and only neighbouring blocks are searched instead of trying each position around a position. Results are the same. Much faster with large offsets (-o).
+- M) A number (MB). Memory budget for loaded files. Groups that would use more memory once loaded are split into one temporary file per chromosome and compared one chromosome at a time; positions of the Variants summarization are sorted on the disk. Results are the same. Temporary files are written inside TMPDIR. Can not be used with -j or -a. If unspecified, groups are always loaded.
+- I) A path toward a file (manifest). Files found during the search are saved inside this file. The next search made with the same manifest only list folders that changed since the previous search and only open files that changed (size or modification time). Results are the same as without this option.
 How this program work:
   1) Folders (-p) are scanned in order to find each variant call format files.
   2) Each variant call files are grouped using a separator or their parent folder (-s)
@@ -100,8 +111,19 @@ quiet=true       # Do information about scan and comparison advancement are disp
 output_file=none  # Do result are printed inside the console or write inside a file.
 output_type=position  # Do this program return Variants summarization or Files comparison or both.
 complete_names=false  # Do files have their complete names when they are displayed.
-
-while getopts 'hgbvdcqp:s:o:t:r:' option;
+profile=none     # A folder where profiling statistics are saved. If none, nothing is profiled.
+pipeline=0       # Maximal number of groups handled at the same time. If 0, groups are handled one by one.
+processes=1      # Number of processes used to handle groups.
+resume=false     # Do groups completed by a previous run are skipped.
+sketch=0         # Size of MinHash sketches used to estimate Files comparison. If 0, scores are exact.
+sketch_exact=none  # Couples of files that are this far from the mean GSCORE are compared exactly.
+structural_overlap=none  # Minimal reciprocal overlap of two structural variants. If none, the offset is used.
+multi_samples=false  # Do each sample of multi-samples files is used as a replicate.
+blocked=false    # Do close positions are searched using blocks.
+memory_limit=none  # Memory budget (MB) for loaded files. If none, groups are always loaded.
+manifest=none    # A file where the search of vcf files is saved and reused. If none, files are searched from scratch.
+
+while getopts 'hgbvdckmBqp:s:o:t:r:P:w:j:a:A:S:I:M:' option;
 do
   case "$option" in
   h) echo "$module_help"; exit
@@ -125,8 +147,30 @@ do
   b) output_type="both"
   ;;
   c) complete_names=true
+  ;;
+  P) profile=$OPTARG
+  ;;
+  w) pipeline=$OPTARG
+  ;;
+  j) processes=$OPTARG
+  ;;
+  k) resume=true
+  ;;
+  m) multi_samples=true
+  ;;
+  B) blocked=true
+  ;;
+  a) sketch=$OPTARG
+  ;;
+  A) sketch_exact=$OPTARG
+  ;;
+  S) structural_overlap=$OPTARG
+  ;;
+  I) manifest=$OPTARG
+  ;;
+  M) memory_limit=$OPTARG
   esac
 done
 
 folder_path=$(readlink -e $folder_path)
-python3 scan.py $folder_path $separator $offset $threshold $open_files $quiet $output_file $output_type $complete_names
+python3 scan.py $folder_path $separator $offset $threshold $open_files $quiet $output_file $output_type $complete_names $profile $pipeline $processes $resume $sketch $sketch_exact $structural_overlap $manifest $multi_samples $memory_limit $blocked
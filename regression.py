@@ -0,0 +1,591 @@
+# encoding=utf-8
+"""This file check that every way of running comparisons still produce the results of the reference engine (a plain
+<scan.main>). A corpus of variant call format files is generated (<generate_corpus>) and each scenario of SCENARIOS
+(a set of options of <scan.main>) is run by each engine of ENGINES :
+    - reference :   <scan.main> without any other option. Its output is compared with the golden output of this
+                        scenario saved inside GOLDEN_FILE.
+    - pipeline :    Groups are loaded and compared at the same time (-w).
+    - processes :   Groups are compared by several processes (-j).
+    - blocked :     Close positions are searched by genomic blocks (-B).
+    - streaming :   Groups are compared out of core with a tiny memory budget (-M).
+    - profiled :    Groups are loaded and compared at the same time while they are profiled (-w and -P).
+    - distributed : <distribute.prepare>, <distribute.work> and <distribute.reduce>.
+    - index :       <compare.compare_against> with indexes made by <compare.build_position_index>.
+    - matrix :      <compare.compare_replicat_matrix> (skipped if NumPy is not installed).
+
+Outputs of the first engines have to be identical to the output of the reference engine. The index and matrix
+engines do not summarize positions : their scores are compared with scores of files of the reference engine.
+Each engine is run in its own process : its time and its peak memory (maximum resident set size) have to stay below
+its ceilings (see <ceilings>). Ceilings of the reference engine are fixed by the scenario, ceilings of other engines
+are ratios of the time and of the memory of the reference engine : eg, the blocked engine has to be twice as fast as
+the reference engine when the offset is large. This file require a Unix system (<os.wait4>).
+
+Golden outputs are canonical (see <canonical_output>) : they do not depend on the order of files inside folders,
+on the folder of the corpus or on versions. Use the "update" command after a change that is expected to modify
+results.
+
+If you decide to call this file from Bash, here a list of accepted arguments :
+    check <folder> <quiet>      Generate the corpus inside <folder> (a temporary folder if "none"), run every
+                                    engine and exit with 1 if a result differ or if a ceiling is exceeded.
+    update <folder> <quiet>     Same as check, but golden outputs are saved instead of being checked.
+    table <engine> <corpus> <scenario> <output>     Used by <run_engine> (index and matrix engines).
+"""
+
+__author__ = "Marchal Florent"
+__copyright__ = "Copyright 2023, Marchal Florent"
+__credits__ = ["Marchal Florent", " Fiston-Lavier Anna-Sophie"]
+__license__ = "CC-BY-SA-4.0"
+__version__ = "1.0.2"
+__maintainer__ = "Marchal Florent"
+__email__ = "flo.marchal2002@gmail.com"
+__status__ = "Production"
+
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import importlib.util
+import compare
+import scan
+
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_FILE = os.path.join(FOLDER, "regression.json")
+CORPUS_SEED = 2023
+CHROMOSOMES = ("chr1", "chr2", "chrX")
+
+# {"{ScenarioName}": (options of <scan.main>, time ceiling (seconds) and memory ceiling (MB) of the reference engine,
+#                     {"{EngineName}": time ratio replacing the one of ENGINES})}.
+# Ceilings of the reference are about three times the usual values on a laptop.
+SCENARIOS = {
+    "exact": ({"output_type": "both"}, 1, 90, {}),
+    "offset": ({"offset": 10, "output_type": "both"}, 1, 90, {}),
+    "threshold": ({"offset": 3, "threshold": 80.0, "output_type": "both"}, 1.5, 90, {}),
+    "wide_offset": ({"offset": 300, "output_type": "file"}, 8, 90, {"blocked": 0.5}),
+    "separator": ({"separator": "-", "offset": 2, "complete_names": True}, 1, 90, {}),
+    "structural": ({"offset": 5, "structural_overlap": 50.0, "output_type": "both"}, 1, 90, {}),
+    "multi_samples": ({"offset": 1, "multi_samples": True, "output_type": "both"}, 1, 90, {}),
+}
+
+# {"{EngineName}": (arguments added to the ones of the reference engine (see <scan.cli>), time ratio, memory ratio)}.
+# Ceilings of an engine are ratios of the time and of the peak memory of the reference engine (same scenario, same
+# run, see <ceilings>). The distributed, index and matrix engines do not use <scan.cli> and the profiled engine
+# also saves statistics next to its output (see <run_engine>).
+ENGINES = {
+    "reference": ([], 1, 1),
+    "pipeline": (["-w", "2"], 2, 1.5),
+    "processes": (["-j", "2"], 2.5, 1.5),
+    "blocked": (["-B"], 1.5, 1.5),
+    "streaming": (["-M", "0.01"], 3, 1),
+    "profiled": (["-w", "2"], 4, 1.5),
+    "distributed": (None, 3, 1.5),
+    "index": (None, 4, 1.5),
+    "matrix": (None, 2, 2),
+}
+MIN_SECONDS = 0.5   # Short runs are mostly the start of Python : time ratios use at least this time.
+
+
+def generate_corpus(path: str, seed: int = CORPUS_SEED) -> str:
+    """Generate a corpus of variant call format files. The same <seed> always generate the same corpus.
+    Each folder is a group (files are also named "{Group}-{Number}.vcf" for separators) :
+        - snp : Substitutions, some of them with several alterations ("A,T"), shifted between replicates.
+        - seq : Insertions and deletions. Sequences are slightly different between replicates (thresholds).
+        - sv : Structural variants (<DEL>, <INS> and <DUP> with END and SVLEN) and substitutions.
+        - dup : Several lines at the same position.
+        - empty : A file without any variant and two other files.
+        - single : A group with only one file.
+        - cohort : A file with three samples (only used with multi_samples).
+    A vCard is also saved with a .vcf extension : it should never be used.
+
+    :param str path:    A path toward a folder. Created if missing.
+    :param int seed:    Seed of the random generator.
+    :return str: <path>
+    """
+    rng = random.Random(seed)
+
+    groups = {
+        "snp": (4, [_snp_record(rng) for _ in range(3000)]),
+        "seq": (3, [_sequence_record(rng) for _ in range(1500)]),
+        "sv": (3, [_structural_record(rng) if rng.random() < 0.6 else _snp_record(rng) for _ in range(1000)]),
+        "dup": (3, [record for _ in range(800) for record in _duplicated_records(rng)]),
+        "empty": (3, [_snp_record(rng) for _ in range(500)]),
+        "single": (1, [_snp_record(rng) for _ in range(100)]),
+    }
+    for groups_name, (number_of_files, records) in groups.items():
+        os.makedirs(os.path.join(path, groups_name), exist_ok=True)
+        for i in range(1, number_of_files + 1):
+            replicate = [] if groups_name == "empty" and i == 1 else _replicate(rng, records)
+            _write_vcf(os.path.join(path, groups_name, f"{groups_name}-{i}.vcf"), replicate)
+
+    # Samples of the cohort carry different alterations of the same records.
+    genotypes = ("0/0", "0/1", "1/1", "./.", "1/2")
+    cohort = []
+    for record in [_snp_record(rng) for _ in range(2000)]:
+        chrom, position, ref, alt, info = record
+        if "," not in alt:
+            alt += "," + rng.choice([base for base in "ACGT" if base not in (ref, alt)])
+        cohort.append((chrom, position, ref, alt, info, [rng.choice(genotypes) for _ in range(3)]))
+    os.makedirs(os.path.join(path, "cohort"), exist_ok=True)
+    _write_vcf(os.path.join(path, "cohort", "cohort-1.vcf"), cohort, samples=("S1", "S2", "S3"))
+
+    with open(os.path.join(path, "snp", "contacts.vcf"), "w") as file:
+        file.write("BEGIN:VCARD\nVERSION:3.0\nFN:Florent\nEND:VCARD\n")
+
+    return path
+
+
+def _snp_record(rng: random.Random) -> tuple:
+    """Internal function. A random substitution (see <_write_vcf>)."""
+    ref = rng.choice("ACGT")
+    alt = rng.choice([base for base in "ACGT" if base != ref])
+    if rng.random() < 0.05:
+        alt += "," + rng.choice([base for base in "ACGT" if base not in (ref, alt)])
+    return rng.choice(CHROMOSOMES), rng.randint(1, 200000), ref, alt, "."
+
+
+def _sequence_record(rng: random.Random) -> tuple:
+    """Internal function. A random insertion or deletion (see <_write_vcf>)."""
+    ref = "".join(rng.choice("ACGT") for _ in range(rng.randint(1, 12)))
+    alt = "".join(rng.choice("ACGT") for _ in range(rng.randint(1, 12)))
+    return rng.choice(CHROMOSOMES), rng.randint(1, 200000), ref, alt, "."
+
+
+def _structural_record(rng: random.Random) -> tuple:
+    """Internal function. A random structural variant (see <_write_vcf>)."""
+    kind = rng.choice(("DEL", "INS", "DUP"))
+    position = rng.randint(1, 200000)
+    length = rng.randint(50, 5000)
+    svlen = -length if kind == "DEL" else length
+    return (rng.choice(CHROMOSOMES), position, rng.choice("ACGT"), f"<{kind}>",
+            f"SVTYPE={kind};END={position + length};SVLEN={svlen}")
+
+
+def _duplicated_records(rng: random.Random) -> list[tuple]:
+    """Internal function. One to three records at the same position (see <_write_vcf>)."""
+    chrom, position, ref, _, info = _snp_record(rng)
+    alts = rng.sample([base for base in "ACGT" if base != ref], rng.randint(1, 3))
+    return [(chrom, position, ref, alt, info) for alt in alts]
+
+
+def _replicate(rng: random.Random, records: list[tuple]) -> list[tuple]:
+    """Internal function. A replicate of <records> : some records are lost, shifted, changed or added.
+
+    :param random.Random rng:   A random generator.
+    :param list records:        Records made by <_snp_record>, <_sequence_record>, etc.
+    :return list: Records of the replicate.
+    """
+    replicate = []
+    for chrom, position, ref, alt, info in records:
+        draw = rng.random()
+        if draw < 0.15:
+            continue
+        elif draw < 0.30:
+            position = max(1, position + rng.randint(-15, 15))
+        elif draw < 0.40 and not alt.startswith("<"):
+            # Change one base of the alteration.
+            i = rng.randrange(len(alt))
+            alt = alt[:i] + rng.choice([base for base in "ACGT" if base != alt[i]]) + alt[i + 1:]
+        elif draw < 0.50 and info.startswith("SVTYPE"):
+            # Move the end of the structural variant.
+            end = int(re.search(r"END=(\d+)", info).group(1))
+            info = re.sub(r"END=\d+", f"END={end + rng.randint(-200, 200)}", info)
+        replicate.append((chrom, position, ref, alt, info))
+
+    replicate += [_snp_record(rng) for _ in range(len(records) // 10)]
+    return replicate
+
+
+def _write_vcf(path: str, records: list[tuple], samples: tuple = ("SAMPLE",)):
+    """Internal function. Write a variant call format file.
+
+    :param str path:        Where the file is written.
+    :param list records:    (CHROM, POS, REF, ALT, INFO) or (CHROM, POS, REF, ALT, INFO, [genotype of each sample]).
+                                Without genotypes, the alteration is carried by each sample.
+    :param tuple samples:   Names of samples.
+    """
+    with open(path, "w") as file:
+        file.write("##fileformat=VCFv4.2\n")
+        file.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t" + "\t".join(samples) + "\n")
+        for record in sorted(records, key=lambda item: (item[0], item[1])):
+            chrom, position, ref, alt, info = record[:5]
+            genotypes = record[5] if len(record) > 5 else ["0/1"] * len(samples)
+            file.write(f"{chrom}\t{position}\t.\t{ref}\t{alt}\t50\tPASS\t{info}\tGT\t" + "\t".join(genotypes) + "\n")
+
+
+def canonical_output(text: str, corpus: str) -> str:
+    """Rewrite an output of <scan.main> so that it only depend on results : the folder of the corpus is replaced,
+    settings are removed, and groups, files and ties between scores are sorted.
+
+    :param str text:    An output of <scan.main>.
+    :param str corpus:  The folder of the corpus.
+    :return str: The canonical output.
+    """
+    paragraphs = []
+    for paragraph in re.split(r"(?m)^(?=###)", text.replace(corpus, "<corpus>")):
+        if not paragraph:
+            continue
+        lines = paragraph.splitlines()
+        blocks = []
+        positions = []
+        current = None
+        for line in lines[1:]:
+            if line.startswith("##"):
+                current = [line]
+                blocks.append(current)
+            elif line.startswith("#SCORE"):
+                current = positions
+            elif line.startswith("#"):
+                continue
+            elif current is positions:
+                fields = line.split("\t")
+                fields[-1] = ";".join(sorted(fields[-1].split(";")))
+                positions.append("\t".join(fields))
+            else:
+                current.append(line)
+
+        # Rows keep their order (best GSCORE and best ISCORE), only ties are sorted.
+        blocks = sorted([block[0]] + sorted(block[1:], key=lambda row: (-float(row.split("\t")[0]),
+                                                                         -float(row.split("\t")[3]), row))
+                        for block in blocks)
+        paragraphs.append("\n".join([lines[0].split("\tsettings: ")[0]] + [row for block in blocks for row in block]
+                                    + positions) + "\n")
+
+    return "".join(sorted(paragraphs))
+
+
+def score_table(text: str) -> dict:
+    """Read scores of files inside an output of <scan.main> (output_type 'file' or 'both').
+
+    :param str text:    An output of <scan.main>.
+    :return dict: {("{GroupName}", "{FileName}", "{SecondPath}"): "GSCORE\tGF\tGM\tISCORE\tIF\tIM"}
+    """
+    table = {}
+    groups_name = name = None
+    for line in text.splitlines():
+        if line.startswith("###"):
+            groups_name, name = line[3:].split("\t")[0], None
+        elif line.startswith("##"):
+            name = line[2:].split("\t")[0]
+        elif line.startswith("#SCORE"):
+            name = None
+        elif not line.startswith("#") and name is not None:
+            fields = line.split("\t")
+            table[(groups_name, name, fields[-1])] = "\t".join(fields[:-1])
+    return table
+
+
+def engine_table(engine: str, corpus: str, scenario: str) -> dict:
+    """Compute scores of files of each group with the index or the matrix engine.
+
+    :param str engine:      "index" or "matrix".
+    :param str corpus:      The folder of the corpus.
+    :param str scenario:    A key of SCENARIOS.
+    :return dict: See <score_table>.
+    """
+    options = SCENARIOS[scenario][0]
+    offset = options.get("offset", 0)
+    threshold = options.get("threshold", None)
+    load_options = {"info": True, "parse_info": False} if options.get("structural_overlap") is not None else {}
+
+    table = {}
+    index_folder = tempfile.mkdtemp(prefix="regression_index_")
+    try:
+        groups = scan.index_groups(corpus, separator=options.get("separator", ""),
+                                   multi_samples=options.get("multi_samples", False))
+        for groups_name, list_of_files in groups.items():
+            group_dict = scan.load_group(list_of_files, multi_samples=options.get("multi_samples", False),
+                                         **load_options)
+            if len(group_dict) < 2:
+                continue
+
+            if engine == "index":
+                indexes = {paths: compare.build_position_index(paths, os.path.join(index_folder, f"{i}.idx"))
+                           for i, paths in enumerate(group_dict)}
+                rows = {paths: compare.compare_against([index for second_path, index in indexes.items()
+                                                        if second_path != paths], paths, offset, threshold)
+                        for paths in group_dict}
+            else:
+                matrices = compare.compare_replicat_matrix(offset, threshold, True, options.get("structural_overlap"),
+                                                           **group_dict)
+                names = matrices["names"]
+                rows = {names[i]: {names[j]: tuple(matrices[key][i, j].item() for key in
+                                                   ("GSCORE", "GF", "GM", "ISCORE", "IF", "IM"))
+                                   for j in range(len(names)) if i != j}
+                        for i in range(len(names))}
+
+            for paths, comparisons in rows.items():
+                name = paths if options.get("complete_names", False) else paths.split("/")[-1].split("\\")[-1]
+                for second_path, results in comparisons.items():
+                    table[(groups_name, name, second_path)] = "\t".join([str(items) for items in results])
+    finally:
+        shutil.rmtree(index_folder, ignore_errors=True)
+
+    return table
+
+
+def run_engine(engine: str, corpus: str, scenario: str, output_file: str) -> tuple:
+    """Run a scenario with an engine. Each step is run in its own process.
+
+    :param str engine:      A key of ENGINES.
+    :param str corpus:      The folder of the corpus.
+    :param str scenario:    A key of SCENARIOS.
+    :param str output_file: Where results are saved. Index and matrix engines save a JSON (see <engine_table>).
+    :return tuple: (Time in seconds, peak memory in MB, None or an error message)
+    """
+    options = SCENARIOS[scenario][0]
+    python = sys.executable
+
+    if engine == "distributed":
+        queue = output_file + ".queue"
+        commands = [[python, os.path.join(FOLDER, "distribute.py"), "prepare", queue, corpus,
+                     options.get("separator", "") or "none", str(options.get("offset", 0)),
+                     str(options.get("threshold", "none")), "true", "true", output_file,
+                     options.get("output_type", "position"), str(options.get("complete_names", False)).lower(), "2"],
+                    [python, os.path.join(FOLDER, "distribute.py"), "work", queue, "true"],
+                    [python, os.path.join(FOLDER, "distribute.py"), "reduce", queue, "true"]]
+    elif engine in ("index", "matrix"):
+        commands = [[python, os.path.abspath(__file__), "table", engine, corpus, scenario, output_file]]
+    else:
+        commands = [[python, os.path.join(FOLDER, "scan.py"), "-p", corpus, "-r", output_file]
+                    + scenario_arguments(options) + ENGINES[engine][0]]
+        if engine == "profiled":
+            commands[0] += ["-P", output_file + ".profile"]
+
+    elapsed, peak = 0, 0
+    for command in commands:
+        seconds, megabytes, error = _measure(command, output_file + ".log")
+        elapsed += seconds
+        peak = max(peak, megabytes)
+        if error is not None:
+            return elapsed, peak, error
+    return elapsed, peak, None
+
+
+def scenario_arguments(options: dict) -> list[str]:
+    """Translate options of a scenario into arguments of <scan.cli>.
+
+    :param dict options:    Options of <scan.main> (see SCENARIOS).
+    :return list: Arguments.
+    """
+    arguments = []
+    if options.get("separator"):
+        arguments += ["-s", options["separator"]]
+    if options.get("offset"):
+        arguments += ["-o", str(options["offset"])]
+    if options.get("threshold") is not None:
+        arguments += ["-t", str(options["threshold"])]
+    if options.get("output_type") == "file":
+        arguments.append("-g")
+    elif options.get("output_type") == "both":
+        arguments.append("-b")
+    if options.get("complete_names"):
+        arguments.append("-c")
+    if options.get("structural_overlap") is not None:
+        arguments += ["-S", str(options["structural_overlap"])]
+    if options.get("multi_samples"):
+        arguments.append("-m")
+    return arguments
+
+
+def _measure(command: list[str], log_file: str) -> tuple:
+    """Internal function. Run a command and measure its time and its peak memory.
+
+    :param list command:    The command.
+    :param str log_file:    Where outputs of the command are saved.
+    :return tuple: (Time in seconds, peak memory in MB, None or an error message)
+    """
+    start = time.perf_counter()
+    with open(log_file, "w") as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    if process.returncode != 0:
+        with open(log_file) as log:
+            last_lines = log.read().strip().splitlines()[-3:]
+        return elapsed, peak, f"exit status {process.returncode} : " + " | ".join(last_lines)
+    return elapsed, peak, None
+
+
+def applicable(engine: str, options: dict) -> bool:
+    """Does an engine support options of a scenario ?
+
+    :param str engine:      A key of ENGINES.
+    :param dict options:    Options of <scan.main> (see SCENARIOS).
+    :return bool: True if this engine can run this scenario.
+    """
+    if engine == "distributed":
+        return options.get("structural_overlap") is None and not options.get("multi_samples")
+    if engine == "index":
+        return (options.get("output_type") in ("file", "both") and options.get("structural_overlap") is None
+                and not options.get("multi_samples"))
+    if engine == "matrix":
+        return options.get("output_type") in ("file", "both") and importlib.util.find_spec("numpy") is not None
+    return True
+
+
+def ceilings(engine: str, scenario: str, reference_usage: tuple = None) -> tuple:
+    """Ceilings of an engine for a scenario (see SCENARIOS and ENGINES).
+
+    :param str engine:              A key of ENGINES.
+    :param str scenario:            A key of SCENARIOS.
+    :param tuple reference_usage:   (Time in seconds, peak memory in MB) of the reference engine for this scenario.
+                                        Not used by the reference engine.
+    :return tuple: (Time ceiling in seconds, memory ceiling in MB)
+    """
+    _, seconds, megabytes, time_ratios = SCENARIOS[scenario]
+    if engine == "reference":
+        return seconds, megabytes
+
+    _, time_ratio, memory_ratio = ENGINES[engine]
+    reference_seconds, reference_megabytes = reference_usage
+    return time_ratios.get(engine, time_ratio) * max(reference_seconds, MIN_SECONDS), memory_ratio * reference_megabytes
+
+
+def run(folder: str = None, update: bool = False, quiet: bool = True) -> bool:
+    """Generate the corpus and run each scenario of SCENARIOS with each engine of ENGINES.
+
+    :param str folder:  Where the corpus and outputs are saved. If None, a temporary folder is used and removed.
+    :param bool update: If True, golden outputs are saved inside GOLDEN_FILE instead of being checked.
+    :param bool quiet:  If False, successful runs are also displayed. Failures are always displayed.
+    :return bool: True if every result is identical and every ceiling is respected.
+    """
+    temporary = folder is None
+    folder = tempfile.mkdtemp(prefix="regression_") if temporary else os.path.abspath(folder)
+    corpus = generate_corpus(os.path.join(folder, "corpus"))
+
+    golden = {"seed": CORPUS_SEED, "scenarios": {}}
+    if os.path.exists(GOLDEN_FILE):
+        with open(GOLDEN_FILE) as file:
+            golden = json.load(file)
+    if golden["seed"] != CORPUS_SEED and not update:
+        raise ValueError(f"Golden outputs were made with another corpus (seed {golden['seed']}). Use 'update'.")
+
+    failures = 0
+    try:
+        for scenario, (options, _, _, _) in SCENARIOS.items():
+            reference_text = None
+            reference_usage = None
+            for engine in ENGINES:
+                if not applicable(engine, options):
+                    if not quiet: print(f"{scenario:<15}{engine:<13}skipped")
+                    continue
+
+                output_file = os.path.join(folder, f"{scenario}.{engine}.txt")
+                for paths in (output_file, output_file + ".queue", output_file + ".profile"):
+                    if os.path.isdir(paths):
+                        shutil.rmtree(paths)
+                    elif os.path.exists(paths):
+                        os.remove(paths)
+
+                elapsed, peak, error = run_engine(engine, corpus, scenario, output_file)
+                if error is None:
+                    error = _check_result(engine, scenario, corpus, output_file, reference_text, golden, update)
+                seconds, megabytes = ceilings(engine, scenario, reference_usage)
+                if error is None and elapsed > seconds:
+                    error = f"time ceiling exceeded ({seconds:.2f} s)"
+                if error is None and peak > megabytes:
+                    error = f"memory ceiling exceeded ({megabytes:.1f} MB)"
+
+                if engine == "reference" and os.path.exists(output_file):
+                    with open(output_file) as file:
+                        reference_text = file.read()
+                    reference_usage = (elapsed, peak)
+
+                line = (f"{scenario:<15}{engine:<13}{elapsed:>6.2f} s / {seconds:<6.2f}"
+                        f"{peak:>7.1f} MB / {megabytes:<7.1f}")
+                if error is None:
+                    if not quiet: print(line + "ok")
+                else:
+                    failures += 1
+                    print(line + f"FAILED : {error}")
+                if engine == "reference" and reference_text is None:
+                    # Other engines can not be checked without the reference.
+                    break
+    finally:
+        if temporary:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    if update:
+        golden["seed"] = CORPUS_SEED
+        with open(GOLDEN_FILE, "w") as file:
+            json.dump(golden, file, indent=4, sort_keys=True)
+            file.write("\n")
+
+    print(f"{failures} failure(s).")
+    return failures == 0
+
+
+def _check_result(engine: str, scenario: str, corpus: str, output_file: str, reference_text: str, golden: dict,
+                  update: bool = False) -> str:
+    """Internal function. Compare the result of an engine with the golden output (reference engine) or with the
+    result of the reference engine (other engines). See <run>.
+
+    :return str: None or an error message.
+    """
+    if not os.path.exists(output_file):
+        return "no output"
+    with open(output_file) as file:
+        text = file.read()
+
+    if engine == "reference":
+        digest = hashlib.sha256(canonical_output(text, corpus).encode()).hexdigest()
+        if update:
+            golden["scenarios"][scenario] = digest
+        elif scenario not in golden["scenarios"]:
+            return "no golden output (use 'update')"
+        elif golden["scenarios"][scenario] != digest:
+            return "output differ from the golden output"
+        return None
+
+    if engine in ("index", "matrix"):
+        # Scores are compared as numbers : empty replicates have a score of 100 or 100.0.
+        table = {tuple(key): [float(items) for items in value.split("\t")] for key, value in json.loads(text)}
+        expected = {key: [float(items) for items in value.split("\t")]
+                    for key, value in score_table(reference_text).items()}
+        different = [key for key in set(table) | set(expected) if table.get(key) != expected.get(key)]
+        if different:
+            return f"{len(different)} score(s) differ from the reference, eg : {sorted(different)[0]}"
+        return None
+
+    # The output file is part of settings.
+    if re.sub(r"output_file=[^;]*;", "", text) != re.sub(r"output_file=[^;]*;", "", reference_text):
+        reference_lines = reference_text.splitlines()
+        lines = text.splitlines()
+        for i, (line, reference_line) in enumerate(zip(lines, reference_lines)):
+            if re.sub(r"output_file=[^;]*;", "", line) != re.sub(r"output_file=[^;]*;", "", reference_line):
+                return f"output differ from the reference at line {i + 1}"
+        return f"output differ from the reference ({len(lines)} lines instead of {len(reference_lines)})"
+    return None
+
+
+if __name__ == "__main__":  # If this file isn't an import.
+    sys_args = sys.argv[1:]
+    args_length = len(sys_args)
+    command = sys_args[0] if args_length >= 1 else "check"
+
+    if command == "table":
+        if args_length < 5 or sys_args[1] not in ("index", "matrix"):
+            raise ValueError("table <engine> <corpus> <scenario> <output> expected.")
+        with open(sys_args[4], "w") as main_file:
+            json.dump(list(engine_table(sys_args[1], sys_args[2], sys_args[3]).items()), main_file)
+
+    elif command in ("check", "update"):
+        main_folder = sys_args[1] if args_length >= 2 and sys_args[1] != "none" else None
+        main_quiet = args_length >= 3 and sys_args[2] in ("true", "1", "y")
+        sys.exit(0 if run(main_folder, update=command == "update", quiet=main_quiet) else 1)
+
+    else:
+        print(__doc__)
+        sys.exit(1)
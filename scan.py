@@ -3,25 +3,38 @@
 can be grouped using their folder <group_file_by_folder> or using their names and a separator <group_file_by_name>.
 This file also contain a <main> that index and compare every .vcf files present below a path.
 
-/!\\ Does not support multi-samples files. /!\\
+Multi-samples files are skipped unless <main>'s <multi_samples> is used : each sample is then a replicate.
 
-If you decide to call this file from Bash, here a list of accepted arguments (see <main>):
+If you decide to call this file from Bash, use options with names (see <cli>) :
+    python3 scan.py -p ~/data -s - --offset 10 --files
+
+or this list of positional arguments (see <main>):
     1 - folder_path
-    2 - offset
-    3 - threshold
-    4 - open_files
-    5 - quiet
-    6 - output_file
-    7 - complete_names
+    2 - separator
+    3 - offset
+    4 - threshold
+    5 - open_files
+    6 - quiet
+    7 - output_file
     8 - output_type
+    9 - complete_names
+    10 - profile
+    11 - pipeline
+    12 - processes
+    13 - resume
+    14 - sketch
+    15 - sketch_exact
+    16 - structural_overlap
+    17 - manifest
+    18 - multi_samples
+    19 - memory_limit
+    20 - blocked
 
 Critics:
     - The process of grouping files could be more effective if file indexing and file grouping was
         done at the same time.
     - The function <is_variant_call_format> is costly in time when open_file=True since it require to read each line of
         the files. Moreover, this function only seek for columns' legends and so is quite easy to fool.
-    - This file could gain in usability if it could be called more easily from Bash (using getopt) (this library was
-        not allowed for this project).
     - A time counter would have been a good idea inside <find_variant_call_format_file> to show to the user that
         the program isn't locked. (Indexing files can be quite long.) (time library was not allowed for this project)
 """
@@ -38,9 +51,24 @@ __status__ = "Production"
 
 import os
 import sys
+import json
+import heapq
+import hashlib
+import threading
 import compare
 
 
+JOURNAL_EXTENSION = ".journal"  # Extension added to <main>'s <output_file> to name its journal.
+PROFILE_TOP_FUNCTIONS = 15    # Number of functions displayed for each profiled phase (see <main>'s <profile>).
+PROFILE_LOCK = threading.Lock()     # Only one profiler can be active at a time (Python >= 3.12).
+POSITION_BYTES = 250        # Estimated memory used by a position of a loaded file (key, list, ...).
+LINE_BYTES = 300            # Estimated memory used by a line of a loaded file (dict, strings, ...).
+FOOTPRINT_SAMPLE_LINES = 1000   # Lines read by <estimate_footprint> to estimate the length of lines.
+RUN_POSITIONS = 200000      # Positions kept in memory before being spilled (see <compare_group_out_of_core>).
+MERGE_RUNS = 64             # Number of spilled runs merged at the same time (see <compare_group_out_of_core>).
+OUTPUT_BLOCK_SIZE = 1 << 20  # Characters of a paragraph gathered before being written (see <output_paragraph>).
+
+
 def is_variant_call_format(path: str, open_file: bool = True, one_sample_only: bool = True, quiet: bool = True) -> bool:
     """This function tell if a file (determined by a path (<path>)) is a variant cell format.
     This function need to open (<open_file>=True) the file in order to discriminate variant cell format and vCard and
@@ -58,39 +86,49 @@ def is_variant_call_format(path: str, open_file: bool = True, one_sample_only: b
         # .vcf file.
         return True
 
+    samples = count_samples(path, quiet=quiet)
+    if samples is None:
+        return False
+
+    if samples < 0:     # <file_marker> is not found.
+        if not quiet: print(f"This file has .vcf extension but does not match with .vcf signature : {path}")
+        return False
+
+    elif one_sample_only is True and samples > 1:
+        if not quiet: print(f"This file can not be used since it contain multiple samples : {path}")
+        return False
+
+    return True
+
+
+def count_samples(path: str, quiet: bool = True) -> int:
+    """Read the header of a .vcf file and count its samples.
+
+    :param str path:    A path to find to the targeted file.
+    :param bool quiet:  If False, files that can not be opened are showed.
+    :return int:        Number of samples inside this file (0 if there is no sample column). -1 if this file does not
+                            match with .vcf signature. None if this file can not be opened.
+    """
     # Define a marker in order to determine whether this file is a variant call format file.
     file_marker = "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO"
     file_marker_length = len(file_marker)
 
-    # <open_file> is True and file is .vcf. Let's open it.
-    result = False
     try:
         file = open(path)
     except PermissionError as E:
         if not quiet: print(f"Can not open {path} ({E})")
-        return result
+        return None
 
     # Loop through this file until <file_marker> is found.
-    line = "temp"
-    while result is False and line:
-        result = line[0:file_marker_length] == file_marker
-
-        if not result:
-            line = file.readline()
-        # Else : The loop will end soon (<result> is True) and we need to keep the line untouched in order to
-        # verifications related to <one_sample_only>.
-
-    if result is False:     # <file_marker> is not found.
-        if not quiet: print(f"This file has .vcf extension but does not match with .vcf signature : {path}")
-
-    elif one_sample_only is True and result is True and len(line.split("\t")) > 10:
-        # If only one sample is inside this file then the legend can not be greater than 10 (8 required columns
-        # + FORMAT + SAMPLE1)
-        if not quiet: print(f"This file can not be used since it contain multiple samples : {path}")
-        result = False
+    samples = -1
+    for line in file:
+        if line[0:file_marker_length] == file_marker:
+            # 8 required columns + FORMAT + SAMPLE1 + SAMPLE2 + ...
+            samples = max(len(line.split("\t")) - 9, 0)
+            break
 
     file.close()
-    return result
+    return samples
 
 
 def find_variant_call_format_file(path: str, open_file: bool = True, quiet: bool = True,
@@ -126,6 +164,132 @@ def find_variant_call_format_file(path: str, open_file: bool = True, quiet: bool
     return list_of_vcf
 
 
+def load_manifest(manifest_path: str, quiet: bool = True) -> dict:
+    """Load a manifest made by <save_manifest>. A missing or unreadable manifest is replaced by an empty one.
+
+    :param str manifest_path:   A path toward a manifest (json).
+    :param bool quiet:          If False, an unreadable manifest is reported.
+    :return dict: {"directories": {"{FolderPath}": [mtime, [[name, is_folder], ...]], ...},
+                   "files": {"{FilePath}": [mtime, size, number of samples], ...}}
+    """
+    manifest = {"directories": {}, "files": {}}
+    if not os.path.isfile(manifest_path):
+        return manifest
+
+    try:
+        with open(manifest_path) as file:
+            content = json.load(file)
+        manifest["directories"] = content["directories"]
+        manifest["files"] = content["files"]
+    except (OSError, ValueError, KeyError, TypeError) as E:
+        if not quiet: print(f"Manifest '{manifest_path}' can not be read and will be rebuilt ({E}).")
+    return manifest
+
+
+def save_manifest(manifest: dict, manifest_path: str):
+    """Save a manifest (see <load_manifest>). The previous manifest is replaced only once the new one is written.
+
+    :param dict manifest:       A manifest (see <load_manifest>).
+    :param str manifest_path:   A path toward a manifest (json).
+    """
+    temporary_path = manifest_path + ".tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(manifest, file)
+    os.replace(temporary_path, manifest_path)
+
+
+def find_indexed_variant_call_format_file(path: str, manifest: dict, open_file: bool = True, quiet: bool = True,
+                                          one_sample_only: bool = True) -> list:
+    """Same as <find_variant_call_format_file>, but use a manifest (see <load_manifest>) of a previous indexing :
+    folders that did not change since this indexing (same mtime) are not listed again and files that did not change
+    (same mtime and size) are not opened again. <manifest> is updated (removed files and folders are forgotten).
+
+    :param str path:            Path to a folder.
+    :param dict manifest:       A manifest (see <load_manifest>). Updated by this function.
+    :param bool open_file:      Do we open file to verify if files are variant call format ? (exclude vCard file).
+    :param bool quiet:          If false, errors handle by this function are displayed.
+    :param one_sample_only:     If True, only file with one sample inside are returned. REQUIRE <open_file>=True.
+    :return list: A list of path that led to .vcf file that respect function's settings.
+    """
+    updated_manifest = {"directories": {}, "files": {}}
+    list_of_vcf = _find_indexed(path, manifest, updated_manifest, open_file, quiet, one_sample_only)
+    manifest.update(updated_manifest)
+    return list_of_vcf
+
+
+def _find_indexed(path: str, manifest: dict, updated_manifest: dict, open_file: bool = True, quiet: bool = True,
+                  one_sample_only: bool = True) -> list:
+    """Internal function. Recursive part of <find_indexed_variant_call_format_file>.
+
+    :param str path:                Path to a folder.
+    :param dict manifest:           The manifest of the previous indexing.
+    :param dict updated_manifest:   The manifest of this indexing. Filled by this function.
+    (See <find_indexed_variant_call_format_file> for other arguments)
+    :return list: A list of path that led to .vcf file that respect function's settings.
+    """
+    list_of_vcf = []
+    if not path[-1] in ("/", "\\"):
+        # Assure that <path> will be considered as a folder.
+        path += "/"
+
+    # A folder's mtime only change when an item is added, removed or renamed inside it.
+    folder_mtime = os.stat(path).st_mtime_ns
+    known_folder = manifest["directories"].get(path)
+    if known_folder is not None and known_folder[0] == folder_mtime:
+        items = known_folder[1]
+    else:
+        items = [[item, os.path.isdir(path + item)] for item in os.listdir(path)]
+    updated_manifest["directories"][path] = [folder_mtime, items]
+
+    for item, is_folder in items:
+        item_path = path + item
+
+        if is_folder:
+            try:
+                list_of_vcf.extend(_find_indexed(item_path, manifest, updated_manifest, open_file=open_file,
+                                                 quiet=quiet, one_sample_only=one_sample_only))
+            except PermissionError as E:    # Might happen when a <path> next close to the root is given.
+                if not quiet: print(f"Can not access to '{item_path}' ({E}).")
+            continue
+
+        if item.split(".")[-1].lower() != "vcf":
+            continue
+
+        # Files' content may change without changing their folder's mtime : files are always checked.
+        try:
+            file_stat = os.stat(item_path)
+        except OSError as E:
+            if not quiet: print(f"Can not access to '{item_path}' ({E}).")
+            continue
+
+        known_file = manifest["files"].get(item_path)
+        if known_file is not None and known_file[0:2] == [file_stat.st_mtime_ns, file_stat.st_size] \
+                and (known_file[2] is not None or not open_file):
+            samples = known_file[2]
+        else:
+            samples = count_samples(item_path, quiet=quiet) if open_file else None
+            if samples is None and open_file:
+                continue    # This file can not be opened : it will be checked again next time.
+        updated_manifest["files"][item_path] = [file_stat.st_mtime_ns, file_stat.st_size, samples]
+
+        if not open_file:
+            result = True
+        elif samples < 0:
+            if not quiet: print(f"This file has .vcf extension but does not match with .vcf signature : {item_path}")
+            result = False
+        elif one_sample_only is True and samples > 1:
+            if not quiet: print(f"This file can not be used since it contain multiple samples : {item_path}")
+            result = False
+        else:
+            result = True
+
+        if result:
+            if not quiet: print("File found : " + item_path)
+            list_of_vcf.append(item_path)
+
+    return list_of_vcf
+
+
 def group_file_by_name(list_of_file: list[str], separator: str = "-") -> dict[str:list[str]]:
     """Group files inside a dictionary of list using their names.
     Eg : list_of_file = ["P15-1", "P30-1", "P15-Alpha"] separator="-":
@@ -202,9 +366,894 @@ def group_file_by_folder(list_of_path: list[str]) -> dict[str:list[str]]:
     return groups
 
 
+def index_groups(path: str, separator: str = "", open_files: bool = True, quiet: bool = True,
+                 manifest: str = None, multi_samples: bool = False) -> dict:
+    """Seek .vcf files inside a folder and its sub folders (<find_variant_call_format_file>) and group them using
+    theirs names (<group_file_by_name>) or theirs parent folder (<group_file_by_folder>).
+
+    :param str path:            A path from where .vcf files are gathered.
+    :param str separator:       A string used to split files names (see <group_file_by_name>). If this string is
+                                    empty, files are groups using their parent folder.
+    :param bool open_files:     Does files are opened to verify that they are variant call format ?
+    :param bool quiet:          If False, information about indexing and grouping are printed.
+    :param str manifest:        A path toward a manifest (see <load_manifest>). If not None, the previous indexing
+                                    saved inside this manifest is reused and updated
+                                    (see <find_indexed_variant_call_format_file>).
+    :param bool multi_samples:  If True, files with multiple samples are kept.
+    :return dict: A dictionary of list : {"{GroupName}" : ["{FilePath1}", "{FilePath1}", ...]}.
+                    This dict is empty when no file is found.
+    """
+    # --- --- Find all vcf files --- ---
+    if not quiet: print("======== Indexing =========\nIndexing .vcf files. This can take some time.")
+    if manifest is None:
+        list_of_path = find_variant_call_format_file(path, open_files, quiet=quiet,
+                                                     one_sample_only=not multi_samples)
+    else:
+        manifest_dict = load_manifest(manifest, quiet=quiet)
+        list_of_path = find_indexed_variant_call_format_file(path, manifest_dict, open_files, quiet=quiet,
+                                                             one_sample_only=not multi_samples)
+        save_manifest(manifest_dict, manifest)
+    if not quiet: print(f"Indexing done : {len(list_of_path)} files found.")
+
+    if len(list_of_path) == 0:
+        return {}
+
+    #  --- --- Group files --- ---
+    if not quiet:
+        p_sep = separator if len(separator) > 0 else "folder names"
+        print(f"======== Group files =========\n"
+              f"Separator used : {p_sep}")
+
+    if len(separator) == 0:
+        grouped_files = group_file_by_folder(list_of_path)
+    else:
+        grouped_files = group_file_by_name(list_of_path, separator=separator)
+
+    if not quiet:
+        print(f"{len(grouped_files)} Groups made :")
+        for group_names, content in grouped_files.items():
+            print(f"    {group_names} : {len(content)} item(s)")
+
+    return grouped_files
+
+
+def settings_string(path: str, separator: str = "", offset: int = 0, threshold: float = None, open_files: bool = True,
+                    quiet: bool = True, output_file: str = None, complete_names: bool = False,
+                    output_type: str = "position", **other_settings) -> str:
+    """Summarize settings used by <main> (see <main> for arguments). This string is displayed inside the header of
+    each group.
+
+    :param other_settings:  Other settings that change results. They are only displayed when they are not None.
+    :return str: A line (ended by a line break) that contain settings and versions of scan.py and compare.py.
+    """
+    str_settings = f"path='{path}';separator='{separator}';offset={offset};threshold={threshold};"
+    str_settings += f"open_files={open_files};quiet={quiet};output_file={output_file};complete_names={complete_names};"
+    str_settings += f"output_type={output_type};"
+    for key, value in other_settings.items():
+        if value is not None:
+            str_settings += f"{key}={value};"
+    str_settings += f"SVersion={__version__};CVersion={compare.__version__}\n"
+    return str_settings
+
+
+def check_comparison_settings(threshold: float = None, output_type: str = "position", sketch: int = 0,
+                              structural_overlap: float = None):
+    """Raise a ValueError if settings of comparisons can not be used together. Used by <main> and by the comparison
+    service (service.py) so that both accept the same settings. See <main> for arguments.
+    """
+    if (threshold is not None) and (not 0 <= threshold <= 100):
+        raise ValueError("<threshold> should be None or a number greater or equal to 0 and lower or equal to 100")
+    if output_type not in ("file", "both", "position"):
+        raise ValueError(f"<output_type> is expected to be 'file', 'both' or 'position'. Got : {output_type}")
+    if sketch < 0:
+        raise ValueError(f"<sketch> is expected to be greater or equal to 0. Got : {sketch}")
+    if sketch > 0 and output_type != "file":
+        raise ValueError("<sketch> can only be used when <output_type> is 'file'.")
+    if structural_overlap is not None:
+        if not 0 <= structural_overlap <= 100:
+            raise ValueError("<structural_overlap> should be None or a number greater or equal to 0 and lower or "
+                             "equal to 100")
+        if sketch > 0:
+            raise ValueError("<structural_overlap> and <sketch> can not be used at the same time.")
+
+
+def result_settings(sketch: int = 0, sketch_exact: float = None, structural_overlap: float = None,
+                    multi_samples: bool = False) -> dict:
+    """Settings of <main> that change results and that are not always displayed (see <settings_string>).
+    See <main> for arguments.
+
+    :return dict: Arguments for <settings_string>. Settings that are not used are None.
+    """
+    return {"sketch": sketch if sketch > 0 else None,
+            "sketch_exact": sketch_exact if sketch > 0 else None,
+            "structural_overlap": structural_overlap,
+            "multi_samples": True if multi_samples else None}
+
+
+def load_group(list_of_files: list[str], quiet: bool = True, multi_samples: bool = False, **line_options) -> dict:
+    """Load each file of a group using <compare.load_vcf_positions>. Files that can not be loaded are skipped.
+
+    :param list[str] list_of_files: A list of path toward .vcf files.
+    :param bool quiet:              If False, errors handled by this function are displayed.
+    :param bool multi_samples:      If True, each sample of files with multiple samples is loaded as a replicate
+                                        named "{FilePath}:{SampleName}" (see <compare.load_vcf_samples>).
+    :param line_options:            Other columns to load (see <compare.load_vcf_positions>). "ALT" is always loaded.
+    :return dict: {"{FilePath}": vcf_dict (see <compare.load_vcf_positions>)}
+    """
+    line_options = {"all_": False, "alt": True, **line_options}
+    group_dict = {}
+    for paths in list_of_files:
+        # Handle errors raised by <compare.load_vcf_positions>
+        try:
+            if multi_samples and (count_samples(paths) or 0) > 1:
+                samples_dict = compare.load_vcf_samples(paths, **line_options)
+            else:
+                samples_dict = None
+                vcf_dict = compare.load_vcf_positions(paths, **line_options)
+        except IndexError as E:
+            if not quiet: print(f"Can not load {paths} : {E}")
+            continue
+        except ValueError as E:
+            if not quiet: print(E)
+            continue
+
+        # Save results
+        if samples_dict is None:
+            group_dict[paths] = vcf_dict
+        else:
+            for samples_names, vcf_dict in samples_dict.items():
+                group_dict[f"{paths}:{samples_names}"] = vcf_dict
+
+    return group_dict
+
+
+def group_paragraph(groups_name: str, score_dict: dict, position_dict: dict, str_settings: str,
+                    output_type: str = "position", complete_names: bool = False) -> str:
+    """Turn results of <compare.compare_replicat> into the text displayed for a group.
+
+    :param str groups_name:     Name of the group.
+    :param dict score_dict:     First item returned by <compare.compare_replicat>.
+    :param dict position_dict:  Second item returned by <compare.compare_replicat>.
+    :param str str_settings:    Settings displayed inside the header of the group.
+    :param str output_type:     'position', 'both' or 'file' (see <main>).
+    :param bool complete_names: Do files' names are displayed using their full path
+    :return str: A paragraph that summarize this group.
+    """
+    # Assure that positions are displayed from the greater occurrence to the lowest.
+    # When two position has the same occurrence, chrom and position are used.
+    sorted_positions = sorted(position_dict.items(), key=lambda item: (round(len(item[1][0]) / item[1][1] * 100, 4),
+                              item[0][0], -1 * item[0][1]), reverse=True)
+    position_lines = (position_line(position, len(found), max_, elements)
+                      for position, (found, max_, elements) in sorted_positions)
+
+    return "".join(_paragraph_chunks(groups_name, score_dict, position_lines, str_settings,
+                                     output_type=output_type, complete_names=complete_names))
+
+
+def position_line(position: tuple, found: int, max_: int, elements: dict) -> str:
+    """Text displayed for a position in the Variants summarization (see <group_paragraph>).
+
+    :param tuple position:  (chromosome, position).
+    :param int found:       Number of replicates that contain this position.
+    :param int max_:        Number of replicates.
+    :param dict elements:   Alterations found at this position and their occurrences.
+    :return str: A line of the Variants summarization.
+    """
+    elements_detail = ";".join([f"{key}={item}" for key, item in elements.items()])
+    chrom, pos = position
+    return f"{round(found / max_ * 100, 4)}\t{chrom}\t{pos}\t{found}\t{max_}\t{elements_detail}\n"
+
+
+def _paragraph_chunks(groups_name: str, score_dict: dict, position_lines, str_settings: str,
+                      output_type: str = "position", complete_names: bool = False):
+    """Internal function. Generator. Yield the paragraph of <group_paragraph> piece by piece.
+
+    :param position_lines:  An iterable of lines made by <position_line>, already sorted. Only used when
+                                <output_type> is 'position' or 'both'.
+    (See <group_paragraph> for other arguments)
+    :return: Yield strings.
+    """
+    file_legend = "#GSCORE\tGF\tGM\tISCORE\tIF\tIM\tFILE\n"
+    position_legend = "#SCORE\tCHROM\tPOS\tGF\tGM\tOCUR\n"
+
+    # Group header
+    group_header_has_been_displayed = False     # Assure that the header of a group is displayed only once.
+    paragraph = ""
+
+    # --- Output scores related to files ---
+    if output_type in ("file", "both"):
+        paragraph = (f"###{groups_name}\tglobal={round(score_dict['__MEANS__']['__MEANS__'][0], 4)}\t"
+                     f"settings: {str_settings}")
+        group_header_has_been_displayed = True
+
+        for paths, comparisons in score_dict.items():
+            if paths == "__MEANS__":
+                # This key is not a file. This key is used to store file's means.
+                continue
+
+            # Reduce name size
+            if complete_names is False:
+                name = paths.split("/")[-1].split("\\")[-1]
+            else:
+                name = paths
+
+            # Generate a text related to this file.
+            path_means = score_dict['__MEANS__'][paths]
+            paragraph += f"##{name}\tglobal={round(path_means[0], 4)}\tinclusion={round(path_means[1], 4)}\n"
+            paragraph += file_legend
+
+            # Assure that result are sorted by best GScore and by best IScore.
+            sorted_comparisons = sorted(comparisons.items(), key=lambda item: (item[1][0], item[1][3]), reverse=True)
+
+            # Display information related to each comparison
+            for second_path, results in sorted_comparisons:
+                paragraph += "\t".join([str(items) for items in results]) + "\t" + second_path + "\n"
+
+    # --- Output scores related to positions ---
+    if output_type in ("position", "both"):
+        if group_header_has_been_displayed is False:
+            paragraph += f"###{groups_name}\tsettings: {str_settings}"
+            group_header_has_been_displayed = True
+
+        paragraph += position_legend
+        yield paragraph
+
+        # Display positions
+        for lines in position_lines:
+            yield lines
+
+    else:
+        yield paragraph
+
+
+def _load_step(groups_name: str, list_of_files: list[str], group_index: int = 0, quiet: bool = True,
+               profile: str = None, load_options: dict = None) -> dict:
+    """Internal function. Load a group of files (see <load_group>).
+
+    :param str groups_name:     Name of the group.
+    :param list list_of_files:  Files inside this group.
+    :param int group_index:     Position of this group. Used to name profiling files.
+    :param bool quiet:          If False, information about this group are printed.
+    :param str profile:         A folder where profiling statistics are saved (see <main>). If None, nothing is profiled.
+    :param dict load_options:   Other columns to load (see <load_group>).
+    :return dict: The result of <load_group> or None if this group does not contain enough loadable files.
+    """
+    if not quiet: print(f"===== Group : '{groups_name}' ====")
+
+    # Groups can not be too smalls. A multi-samples file can hold a whole group.
+    if len(list_of_files) < 2 and not (load_options or {}).get("multi_samples"):
+        if not quiet: print(f"'{groups_name}' group is too small : {len(list_of_files)} item(s) / {2}.")
+        return None
+
+    # --- Load files ---
+    if profile is None:
+        group_dict = load_group(list_of_files, quiet=quiet, **(load_options or {}))
+    else:
+        group_dict = _profile_call(profile, f"{group_index}_{groups_name}", "load", load_group,
+                                   list_of_files, quiet=quiet, **(load_options or {}))
+
+    # Groups can not be too smalls (again). Group can reduce in volume if some file can not be load.
+    if len(group_dict) < 2:
+        if not quiet: print(f"Can not use this group. Not enough file can be loaded.")
+        return None
+
+    return group_dict
+
+
+def compare_group(groups_name: str, group_dict: dict, str_settings: str, group_index: int = 0, offset: int = 0,
+                  threshold: float = None, quiet: bool = True, output_type: str = "position",
+                  complete_names: bool = False, profile: str = None, sketch: int = 0,
+                  sketch_exact: float = None, structural_overlap: float = None, blocked: bool = False) -> str:
+    """Compare files of a loaded group and return the paragraph related to this group.
+    See <main> for arguments.
+
+    :param str groups_name:     Name of the group.
+    :param dict group_dict:     A group loaded by <load_group>.
+    :param int group_index:     Position of this group. Used to name profiling files.
+    :return str: See <group_paragraph>.
+    """
+    # --- File comparisons ---
+    if sketch > 0:
+        comparison = compare.compare_replicat_sketch
+        comparison_options = {"sketch_size": sketch, "exact_margin": sketch_exact}
+    else:
+        comparison = compare.compare_replicat
+        comparison_options = {"structural_overlap": structural_overlap, "blocked": blocked}
+
+    if profile is None:
+        results = comparison(offset=offset, sequence_threshold=threshold, quiet=quiet, **comparison_options,
+                             **group_dict)
+    else:
+        results = _profile_call(profile, f"{group_index}_{groups_name}", "compare", comparison, offset=offset,
+                                sequence_threshold=threshold, quiet=quiet, **comparison_options, **group_dict)
+
+    # Sketches only estimate scores of files : there is no position to display.
+    score_dict, position_dict = (results, {}) if sketch > 0 else results
+
+    # --- Display results ---
+    return group_paragraph(groups_name, score_dict, position_dict, str_settings,
+                           output_type=output_type, complete_names=complete_names)
+
+
+def estimate_footprint(path: str, multi_samples: bool = False) -> int:
+    """Estimate the memory used by a file once loaded by <load_group>. The number of lines is estimated using the
+    size of the file and the mean length of its first lines (see <FOOTPRINT_SAMPLE_LINES>).
+
+    :param str path:            A path toward a .vcf file.
+    :param bool multi_samples:  If True, each sample of a multi-samples file is counted as a loaded file
+                                    (see <load_group>).
+    :return int: Estimated memory in bytes.
+    """
+    header_size = 0
+    body_size = 0
+    body_lines = 0
+    samples = 1
+    with open(path) as file:
+        for lines in file:
+            if lines[0:1] == "#":
+                header_size += len(lines)
+                if lines[0:2] != "##" and multi_samples:
+                    samples = max(len(lines.split("\t")) - 9, 1)
+                continue
+
+            body_size += len(lines)
+            body_lines += 1
+            if body_lines >= FOOTPRINT_SAMPLE_LINES:
+                break
+
+    if body_lines == 0:
+        return 0
+
+    estimated_lines = (os.path.getsize(path) - header_size) / (body_size / body_lines)
+    return int(estimated_lines * samples * (POSITION_BYTES + LINE_BYTES))
+
+
+def _group_footprint(list_of_files: list[str], load_options: dict = None) -> int:
+    """Internal function. Estimate the memory used by a group once loaded (see <estimate_footprint>).
+
+    :param list list_of_files:  Files inside a group.
+    :param dict load_options:   Other columns to load (see <load_group>).
+    :return int: Estimated memory in bytes.
+    """
+    multi_samples = bool((load_options or {}).get("multi_samples"))
+    total_size = 0
+    for paths in list_of_files:
+        try:
+            total_size += estimate_footprint(paths, multi_samples=multi_samples)
+        except (OSError, ValueError):
+            # This file will not be loaded anyway.
+            continue
+    return total_size
+
+
+def compare_group_out_of_core(groups_name: str, list_of_files: list[str], str_settings: str, group_index: int = 0,
+                              offset: int = 0, threshold: float = None, quiet: bool = True,
+                              output_type: str = "position", complete_names: bool = False, profile: str = None,
+                              sketch: int = 0, sketch_exact: float = None, structural_overlap: float = None,
+                              blocked: bool = False, load_options: dict = None):
+    """Same as <_load_step> followed by <compare_group>, for groups that do not fit in memory. Files are split into
+    one partition per chromosome inside a temporary folder (see <compare.partition_vcf>) and replicates are compared
+    one chromosome at a time (see <compare.compare_replicat_by_chromosome>). Positions of the Variants summarization
+    are sorted by runs of <RUN_POSITIONS> positions that are written inside the temporary folder and merged when
+    the paragraph is written. Results are the same as the ones of <compare_group>.
+
+    :param list list_of_files:  Files inside this group.
+    :param dict load_options:   Other columns to load (see <load_group>).
+    (See <compare_group> for other arguments)
+    :return: An iterator of strings that make the paragraph of this group (see <output_paragraph>), or None if this
+                group can not be compared. The temporary folder is removed once the iterator is exhausted.
+    """
+    if sketch > 0:
+        raise ValueError("<sketch> can not be used on groups compared out of core.")
+
+    if not quiet: print(f"===== Group : '{groups_name}' ====")
+
+    # Groups can not be too smalls. A multi-samples file can hold a whole group.
+    load_options = dict(load_options or {})
+    multi_samples = load_options.pop("multi_samples", False)
+    if len(list_of_files) < 2 and not multi_samples:
+        if not quiet: print(f"'{groups_name}' group is too small : {len(list_of_files)} item(s) / {2}.")
+        return None
+
+    if not quiet: print("This group does not fit inside <memory_limit> : it is compared one chromosome at a time.")
+    import tempfile
+    line_options = {"all_": False, "alt": True, **load_options}
+    spill = tempfile.TemporaryDirectory(prefix="vcf-comparator-")
+
+    # --- Split files ---
+    files = []  # (path, partitions, samples' names or None)
+    replicates_names = []
+    for index, paths in enumerate(list_of_files):
+        folder = os.path.join(spill.name, str(index))
+        os.mkdir(folder)
+        # Handle errors raised by <compare.partition_vcf> (same as <load_group>)
+        try:
+            partitions, samples = compare.partition_vcf(paths, folder, **line_options)
+        except IndexError as E:
+            if not quiet: print(f"Can not load {paths} : {E}")
+            continue
+        except ValueError as E:
+            if not quiet: print(E)
+            continue
+
+        if multi_samples and len(samples) > 1:
+            files.append((paths, partitions, samples))
+            replicates_names.extend(f"{paths}:{samples_names}" for samples_names in samples)
+        else:
+            files.append((paths, partitions, None))
+            replicates_names.append(paths)
+
+    # Groups can not be too smalls (again). Group can reduce in volume if some file can not be load.
+    if len(replicates_names) < 2:
+        if not quiet: print(f"Can not use this group. Not enough file can be loaded.")
+        spill.cleanup()
+        return None
+
+    def load_chromosome(chrom):
+        replicates = {}
+        for paths, partitions, samples in files:
+            if chrom not in partitions:
+                continue
+            if samples is None:
+                replicates[paths] = compare.load_vcf_positions(partitions[chrom], **line_options)
+            else:
+                for samples_names, vcf_dict in compare.load_vcf_samples(partitions[chrom], **line_options).items():
+                    replicates[f"{paths}:{samples_names}"] = vcf_dict
+        return replicates
+
+    # --- Spill sorted runs of positions ---
+    runs = []
+    buffer = []
+
+    def spill_buffer():
+        buffer.sort(reverse=True)
+        runs.append(os.path.join(spill.name, f"run{len(runs)}.txt"))
+        with open(runs[-1], "w") as file:
+            file.writelines(lines for _, lines in buffer)
+        buffer.clear()
+
+    def save_positions(positions_dict):
+        for position, (found, max_, elements) in positions_dict.items():
+            # Same order as <group_paragraph>.
+            buffer.append(((round(len(found) / max_ * 100, 4), position[0], -1 * position[1]),
+                           position_line(position, len(found), max_, elements)))
+            if len(buffer) >= RUN_POSITIONS:
+                spill_buffer()
+
+    # --- File comparisons ---
+    chromosomes = sorted({chrom for _, partitions, _ in files for chrom in partitions})
+    comparison_options = {"offset": offset, "sequence_threshold": threshold, "quiet": quiet,
+                          "structural_overlap": structural_overlap, "blocked": blocked,
+                          "save_positions": save_positions if output_type in ("position", "both") else None}
+    if profile is None:
+        score_dict = compare.compare_replicat_by_chromosome(replicates_names, chromosomes, load_chromosome,
+                                                            **comparison_options)
+    else:
+        score_dict = _profile_call(profile, f"{group_index}_{groups_name}", "compare",
+                                   compare.compare_replicat_by_chromosome, replicates_names, chromosomes,
+                                   load_chromosome, **comparison_options)
+    if buffer:
+        spill_buffer()
+
+    # Merge runs until they can be opened at the same time.
+    while len(runs) > MERGE_RUNS:
+        merged = []
+        for i in range(0, len(runs), MERGE_RUNS):
+            merged.append(os.path.join(spill.name, f"merge{len(merged)}_{os.path.basename(runs[i])}"))
+            _merge_runs(runs[i:i + MERGE_RUNS], merged[-1])
+        runs = merged
+
+    return _spilled_paragraph(spill, runs, groups_name, score_dict, str_settings, output_type, complete_names)
+
+
+def _run_key(line: str) -> tuple:
+    """Internal function. Sort key of a line made by <position_line> (same order as <group_paragraph>).
+
+    :param str line:    A line made by <position_line>.
+    :return tuple: (score, chromosome, - position)
+    """
+    score, chrom, pos, _ = line.split("\t", 3)
+    return float(score), chrom, -1 * int(pos)
+
+
+def _merge_runs(runs: list[str], output_path: str):
+    """Internal function. Merge sorted runs (see <compare_group_out_of_core>) into one sorted run. Merged runs are
+    removed.
+
+    :param list runs:       Paths toward sorted runs.
+    :param str output_path: Path of the merged run.
+    """
+    files = [open(run) for run in runs]
+    try:
+        with open(output_path, "w") as output:
+            output.writelines(heapq.merge(*files, key=_run_key, reverse=True))
+    finally:
+        for file in files:
+            file.close()
+    for run in runs:
+        os.remove(run)
+
+
+def _spilled_paragraph(spill, runs: list[str], groups_name: str, score_dict: dict, str_settings: str,
+                       output_type: str = "position", complete_names: bool = False):
+    """Internal function. Generator. Yield the paragraph of a group compared by <compare_group_out_of_core> and
+    remove its temporary folder (<spill>) at the end.
+
+    :param spill:       A tempfile.TemporaryDirectory.
+    :param list runs:   Paths toward sorted runs of positions.
+    (See <group_paragraph> for other arguments)
+    :return: Yield strings.
+    """
+    files = [open(run) for run in runs]
+    try:
+        yield from _paragraph_chunks(groups_name, score_dict, heapq.merge(*files, key=_run_key, reverse=True),
+                                     str_settings, output_type=output_type, complete_names=complete_names)
+    finally:
+        for file in files:
+            file.close()
+        spill.cleanup()
+
+
+def _sequential_groups(groups: list, quiet: bool = True, profile: str = None, load_options: dict = None,
+                       memory_limit: int = None, **compare_options):
+    """Internal function. Generator. Load and compare groups one after the other.
+
+    :param list groups:         Groups to handle : [(group_index, groups_name, list_of_files), ...].
+    :param bool quiet:          If False, information about groups are printed.
+    :param str profile:         A folder where profiling statistics are saved (see <main>).
+    :param dict load_options:   Other columns to load (see <load_group>).
+    :param int memory_limit:    Groups that would use more memory (bytes) are compared out of core
+                                    (see <compare_group_out_of_core>). If None, groups are always loaded.
+    :param compare_options:     Other arguments for <compare_group>.
+    :return: Yield (group_index, groups_name, paragraph) for each group in the order of <groups>. The paragraph
+                (see <group_paragraph> and <compare_group_out_of_core>) is None when the group can not be compared.
+    """
+    for group_index, groups_name, list_of_files in groups:
+        yield group_index, groups_name, _process_group(groups_name, list_of_files, group_index=group_index,
+                                                       quiet=quiet, profile=profile, load_options=load_options,
+                                                       memory_limit=memory_limit, **compare_options)
+
+
+def _pipeline_groups(groups: list, in_flight: int, quiet: bool = True, profile: str = None, load_options: dict = None,
+                     memory_limit: int = None, **compare_options):
+    """Internal function. Generator. Same as <_sequential_groups> but loading, comparison and output are done
+    at the same time on different groups : a thread loads the next groups while a second one compares the previous
+    ones and while paragraphs are yielded (and so written) by the caller.
+
+    Each stage handle groups one by one and in the same order, so paragraphs are yielded in the order of
+    <groups>. No more than <in_flight> groups can be loaded and waiting for their comparison or for their
+    output at the same time : this bound the memory used by loaded files. Groups that would use more than
+    <memory_limit> / <in_flight> bytes are not loaded : they are compared out of core by the second thread.
+
+    :param list groups:         Groups to handle : [(group_index, groups_name, list_of_files), ...].
+    :param int in_flight:       Maximum number of groups handled at the same time (greater or equal to 1).
+    :param bool quiet:          If False, information about groups are printed.
+    :param str profile:         A folder where profiling statistics are saved (see <main>).
+    :param dict load_options:   Other columns to load (see <load_group>).
+    :param int memory_limit:    See <_sequential_groups>.
+    :param compare_options:     Other arguments for <compare_group>.
+    :return: See <_sequential_groups>.
+    """
+    import queue
+    import threading
+
+    slots = threading.Semaphore(max(1, in_flight))  # One slot per group that is loaded and not yet written.
+    group_limit = memory_limit / max(1, in_flight) if memory_limit is not None else None
+    stop = threading.Event()        # Set when the caller stop to consume paragraphs.
+    loaded = queue.Queue()          # (group_index, groups_name, group_dict or list_of_files, out_of_core) ;
+                                    # None mark the end.
+    compared = queue.Queue()        # (group_index, groups_name, paragraph) ; None mark the end ;
+                                    # Exceptions are raised by the caller.
+
+    def loader():
+        try:
+            for group_index, groups_name, list_of_files in groups:
+                slots.acquire()
+                if stop.is_set():
+                    break
+                if memory_limit is not None and _group_footprint(list_of_files, load_options) > group_limit:
+                    # Too large : the group is split and compared by <comparator>.
+                    loaded.put((group_index, groups_name, list_of_files, True))
+                    continue
+                loaded.put((group_index, groups_name, _load_step(groups_name, list_of_files, group_index=group_index,
+                                                                 quiet=quiet, profile=profile,
+                                                                 load_options=load_options), False))
+        except BaseException as E:
+            loaded.put(E)
+        loaded.put(None)
+
+    def comparator():
+        while (item := loaded.get()) is not None:
+            if isinstance(item, BaseException) or stop.is_set() or item[2] is None:
+                compared.put(item if isinstance(item, BaseException) else item[:3])
+                continue
+            group_index, groups_name, group, out_of_core = item
+            try:
+                if out_of_core:
+                    paragraph = compare_group_out_of_core(groups_name, group, group_index=group_index, quiet=quiet,
+                                                          profile=profile, load_options=load_options,
+                                                          **compare_options)
+                else:
+                    paragraph = compare_group(groups_name, group, group_index=group_index, quiet=quiet,
+                                              profile=profile, **compare_options)
+                compared.put((group_index, groups_name, paragraph))
+            except BaseException as E:
+                compared.put(E)
+        compared.put(None)
+
+    threads = [threading.Thread(target=loader, daemon=True), threading.Thread(target=comparator, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while (item := compared.get()) is not None:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+            slots.release()
+    finally:
+        # Let threads end by themselves : the loader does not load anything new once <stop> is set.
+        stop.set()
+        slots.release()
+
+
+def _group_cost(list_of_files: list[str]) -> int:
+    """Internal function. Estimate how long a group will take to be handled : total size of its files (bytes)
+    multiplied by the number of comparisons made inside this group (binomial coefficient (n, 2)).
+
+    :param list list_of_files:  Files inside a group.
+    :return int: An estimation of the cost of this group.
+    """
+    total_size = 0
+    for paths in list_of_files:
+        try:
+            total_size += os.path.getsize(paths)
+        except OSError:
+            # This file will not be loaded anyway.
+            continue
+
+    number_of_files = len(list_of_files)
+    return total_size * (number_of_files * (number_of_files - 1) // 2)
+
+
+def _process_group(groups_name: str, list_of_files: list[str], group_index: int = 0, quiet: bool = True,
+                   profile: str = None, load_options: dict = None, memory_limit: int = None, **compare_options):
+    """Internal function. Load and compare a group (see <_load_step> and <compare_group>). Groups that would use more
+    than <memory_limit> bytes once loaded are compared out of core (see <compare_group_out_of_core>).
+
+    :return: See <group_paragraph> and <compare_group_out_of_core>. None if this group can not be compared.
+    """
+    if memory_limit is not None and _group_footprint(list_of_files, load_options) > memory_limit:
+        return compare_group_out_of_core(groups_name, list_of_files, group_index=group_index, quiet=quiet,
+                                         profile=profile, load_options=load_options, **compare_options)
+
+    group_dict = _load_step(groups_name, list_of_files, group_index=group_index, quiet=quiet, profile=profile,
+                            load_options=load_options)
+    if group_dict is None:
+        return None
+    return compare_group(groups_name, group_dict, group_index=group_index, quiet=quiet, profile=profile,
+                         **compare_options)
+
+
+def _parallel_groups(groups: list, processes: int, quiet: bool = True, profile: str = None, load_options: dict = None,
+                     **compare_options):
+    """Internal function. Generator. Same as <_sequential_groups> but groups are handled by a pool of <processes>
+    processes. Groups are submitted from the most expensive to the cheapest one (see <_group_cost>) and idle
+    processes take the next waiting group : large groups do not end up alone at the end of the run.
+    Paragraphs are still yielded in the order of <groups>.
+
+    :param list groups:         Groups to handle : [(group_index, groups_name, list_of_files), ...].
+    :param int processes:       Number of worker processes.
+    :param bool quiet:          If False, information about groups are printed.
+    :param str profile:         A folder where profiling statistics are saved (see <main>).
+    :param dict load_options:   Other columns to load (see <load_group>).
+    :param compare_options:     Other arguments for <compare_group>.
+    :return: See <_sequential_groups>.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    submit_order = sorted(range(0, len(groups)), key=lambda index: _group_cost(groups[index][2]), reverse=True)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [None] * len(groups)
+        for index in submit_order:
+            group_index, groups_name, list_of_files = groups[index]
+            futures[index] = executor.submit(_process_group, groups_name, list_of_files, group_index=group_index,
+                                             quiet=quiet, profile=profile, load_options=load_options,
+                                             **compare_options)
+
+        for (group_index, groups_name, _), future in zip(groups, futures):
+            yield group_index, groups_name, future.result()
+
+
+def _read_journal(journal_path: str) -> tuple:
+    """Internal function. Read a journal written by <_journal_group>. Incomplete lines (a crash happened while they
+    were written) are ignored.
+
+    :param str journal_path:    A path toward a journal.
+    :return tuple: (settings' hash (None if the journal is empty), {"{GroupName}": size of the output file once this
+                    group has been written}, size of complete lines (in bytes))
+    """
+    settings_hash = None
+    completed = {}
+    complete_size = 0
+    with open(journal_path, mode="rb") as file:
+        for raw_line in file:
+            if not raw_line.endswith(b"\n"):
+                # Partial line.
+                break
+            complete_size += len(raw_line)
+            line = raw_line.decode()
+            if line.startswith("#settings="):
+                settings_hash = line[len("#settings="):-1]
+                continue
+            # Groups are identified by their names : indexes change when folders are added or removed.
+            split_line = line[:-1].split("\t", 2)
+            completed[split_line[2]] = int(split_line[1])
+    return settings_hash, completed, complete_size
+
+
+def _journal_group(journal_path: str, group_index: int, groups_name: str, output_file: str):
+    """Internal function. Record inside the journal that a group is completed. The line is flushed on the disk
+    before this function ends : once a group is inside the journal, its paragraph is inside <output_file>.
+
+    :param str journal_path:    A path toward a journal.
+    :param int group_index:     Index of the completed group.
+    :param str groups_name:     Name of the completed group.
+    :param str output_file:     The file where paragraphs are written.
+    """
+    with open(journal_path, mode="a") as file:
+        file.write(f"{group_index}\t{os.path.getsize(output_file)}\t{groups_name}\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def output_paragraph(paragraph, output_file: str = None, quiet: bool = True) -> bool:
+    """Write <paragraph> at the end of <output_file> or print it if <output_file> is None.
+
+    If <paragraph> can not be written, <output_file> is cut back to its size before this call and <paragraph> is
+    printed instead. If <paragraph> is an iterator that raises an exception, <output_file> is cut back the same way
+    and the exception is raised again : <output_file> never ends with a part of a paragraph.
+
+    :param paragraph:       Text related to a group (see <group_paragraph>). Can also be an iterator of strings
+                                (see <compare_group_out_of_core>) : the paragraph is then written piece by piece.
+    :param str output_file: A path toward the file where results are saved. If None, <paragraph> is printed.
+    :param bool quiet:      If False, <paragraph> is also printed when it is written inside <output_file>.
+    :return bool: False if <paragraph> can not be written inside <output_file>.
+    """
+    chunks = iter([paragraph] if isinstance(paragraph, str) else paragraph)
+    if not output_file:
+        for chunk in chunks:
+            print(chunk, end="")
+        print()
+        return True
+
+    # Pieces are written by blocks without any other buffer : if a write fails, what is inside <output_file> is
+    # exactly what has been written.
+    start = os.path.getsize(output_file) if os.path.isfile(output_file) else 0
+    unwritten = b""     # End of the block that could not be written.
+    error = None
+    try:
+        descriptor = os.open(output_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+    except OSError as E:
+        descriptor, error = None, E
+
+    if descriptor is not None:
+        try:
+            block, block_size = [], 0
+            for chunk in chunks:
+                if not quiet: print(chunk, end="")
+                block.append(chunk)
+                block_size += len(chunk)
+                if block_size >= OUTPUT_BLOCK_SIZE:
+                    unwritten, error = _write_block(descriptor, block)
+                    block, block_size = [], 0
+                    if error is not None:
+                        break
+            else:
+                unwritten, error = _write_block(descriptor, block)
+                if error is None:
+                    os.fsync(descriptor)
+        except OSError as E:
+            # Raised by fsync.
+            error = E
+        except BaseException:
+            # The paragraph can not be made (eg : inside <compare_group_out_of_core>) : nothing of it is kept.
+            os.close(descriptor)
+            _cut_output(output_file, start)
+            raise
+        os.close(descriptor)
+
+    if error is None:
+        if not quiet:
+            print()
+        return True
+
+    print(f" --- --- --- --- Can not proceed file write : {error} --- --- --- ---")
+    # Do not loose work : what has been written, what could not be written and the end of the paragraph.
+    if os.path.isfile(output_file):
+        with open(output_file, mode="rb") as file:
+            file.seek(start)
+            while piece := file.read(OUTPUT_BLOCK_SIZE):
+                sys.stdout.write(piece.decode(errors="replace"))
+    sys.stdout.write(unwritten.decode(errors="replace"))
+    _cut_output(output_file, start)
+    for chunk in chunks:
+        print(chunk, end="")
+    print()
+    print(f" --- --- --- --- Can not proceed file write : {error} --- --- --- ---")
+    return False
+
+
+def _write_block(descriptor: int, block: list[str]) -> tuple:
+    """Internal function. Write pieces of a paragraph (see <output_paragraph>).
+
+    :param int descriptor:  A file descriptor opened by <output_paragraph>.
+    :param list block:      Pieces to write.
+    :return tuple: (bytes that could not be written, None or the error raised by the write)
+    """
+    data = "".join(block).encode()
+    written = 0
+    try:
+        while written < len(data):
+            written += os.write(descriptor, data[written:])
+    except OSError as E:
+        return data[written:], E
+    return b"", None
+
+
+def _cut_output(output_file: str, size: int):
+    """Internal function. Cut <output_file> back to <size> bytes (see <output_paragraph>). Errors are ignored : the
+    file can be a device or can be missing.
+
+    :param str output_file: A path toward the file where results are saved.
+    :param int size:        Size of <output_file> before the paragraph was written.
+    """
+    if os.path.isfile(output_file):
+        try:
+            os.truncate(output_file, size)
+        except OSError:
+            pass
+
+
+def _profile_call(profile: str, name: str, phase: str, function, *args, **kwargs):
+    """Internal function. Call <function> under cProfile. Statistics are saved inside <profile> as
+    '{name}.{phase}.pstats' and the most expensive functions (cumulative time) are printed.
+    cProfile and pstats are only imported here : nothing is paid when profiling is off.
+    Profiled phases never run at the same time (PROFILE_LOCK) : since Python 3.12, starting a profiler while another
+    one is active raises a ValueError. With <main>'s <pipeline>, loading and comparisons are then done one after the
+    other.
+
+    :param str profile:     A path toward a folder where .pstats files are saved.
+    :param str name:        Name used for the .pstats file (usually the index and the name of a group).
+    :param str phase:       Name of the profiled phase ('load', 'compare', ...).
+    :param function:        The function to profile. <args> and <kwargs> are passed to this function.
+    :return: What <function> returns.
+    """
+    import cProfile
+    import pstats
+
+    with PROFILE_LOCK:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function, *args, **kwargs)
+
+        # A group name can be a path : keep a flat file name.
+        file_name = name.replace("/", "_").replace("\\", "_").strip("_")
+        stats_path = os.path.join(profile, f"{file_name}.{phase}.pstats")
+        profiler.dump_stats(stats_path)
+
+        print(f"--- --- Profile : '{name}' ({phase}) saved inside {stats_path} --- ---")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return result
+
+
 def main(path, separator: str = "", offset: int = 0, threshold: float = None, open_files: bool = True,
          quiet: bool = True, output_file: str = None,
-         complete_names: bool = False, output_type: str = "position"):
+         complete_names: bool = False, output_type: str = "position", profile: str = None, pipeline: int = 0,
+         processes: int = 1, resume: bool = False, sketch: int = 0, sketch_exact: float = None,
+         structural_overlap: float = None, manifest: str = None, multi_samples: bool = False,
+         memory_limit: float = None, only_groups: list[str] = None, grouped_files: dict = None,
+         blocked: bool = False):
     """Seek .vcf files inside a folder and its sub folders. Files are groups using theirs names or theirs parent folder.
     Each vcf of each group is compared with other vcf of the same group. A score of similarity is then displayed.
     See <compare.compare_replicat> to know how the score of similarity is determined.
@@ -229,7 +1278,49 @@ def main(path, separator: str = "", offset: int = 0, threshold: float = None, op
                                     'position': Variants summarization
                                     'file': Files comparison
                                     'both': Both Files comparison and Variants summarization
-
+    :param str profile:         A path toward a folder. If not None, the loading and the comparison of each group are
+                                    profiled (cProfile). Statistics are saved inside this folder
+                                    ('{index}_{group}.load.pstats' and '{index}_{group}.compare.pstats') and the most
+                                    expensive functions are printed. If None, nothing is profiled.
+    :param int pipeline:        If greater than 0, groups are loaded, compared and written at the same time (see
+                                    <_pipeline_groups>). No more than <pipeline> groups are held in memory at the same
+                                    time. Results are written in the same order. If 0, groups are handled one by one.
+    :param int processes:       If greater than 1, groups are handled by a pool of <processes> processes (see
+                                    <_parallel_groups>). Results are written in the same order. Can not be used
+                                    with <pipeline>.
+    :param bool resume:         When <output_file> is used, completed groups are recorded inside a journal
+                                    ('<output_file>.journal'). If True, groups completed by a previous run (with the
+                                    same settings) are skipped and missing groups are added at the end of
+                                    <output_file>. Groups are recognized by their names : groups added since the
+                                    previous run are also compared. If False, <output_file> and its journal are overwritten.
+    :param int sketch:          If greater than 0, scores of files are estimated using MinHash sketches of <sketch>
+                                    hashes instead of comparing each position (see <compare.compare_replicat_sketch>).
+                                    Only available when <output_type> is 'file'.
+    :param float sketch_exact:  When <sketch> is used, couples of files with an estimated GSCORE at least
+                                    <sketch_exact> points away from the mean GSCORE of their group are compared
+                                    exactly. If None, all scores are estimations.
+    :param float structural_overlap: If not None, structural variants ("<DEL>", "<INS>", "<DUP>") are matched using
+                                    their spans (END or SVLEN inside INFO) instead of <offset> : two structural
+                                    variants of the same type match when they overlap each other by at least
+                                    <structural_overlap> percent of their lengths (see <compare.compare_pair>).
+    :param str manifest:        A path toward a manifest (json). If not None, the indexing is saved inside this
+                                    manifest and the next indexing only look at folders and files that changed
+                                    (see <find_indexed_variant_call_format_file>).
+    :param bool multi_samples:  If True, files with multiple samples are used : each sample is compared as if it was
+                                    a file of the group (see <compare.load_vcf_samples>). Names of these replicates
+                                    are "{FilePath}:{SampleName}".
+    :param float memory_limit:  A memory budget (MB) for loaded files. Groups that would use more memory once
+                                    loaded (see <estimate_footprint>) are compared one chromosome at a time using
+                                    temporary files (see <compare_group_out_of_core>). Results are the same.
+                                    With <pipeline>, this budget is shared by groups in flight.
+                                    Can not be used with <processes> or <sketch>. If None, groups are always loaded.
+    :param list only_groups:    If not None, only groups with these names are compared (names are displayed in
+                                    headers of groups). Other groups keep their place (see <resume>).
+    :param dict grouped_files:  If not None, these groups (see <index_groups>) are used instead of indexing <path>.
+                                    Used by <cli> to index a path only once.
+    :param bool blocked:        If True, positions of files are sorted by blocks of <offset> + 1 bases and only
+                                    neighbouring blocks are searched (see <compare.position_blocks>). Results are the
+                                    same. Much faster when <offset> is large (hundreds or thousands of bases).
     """
     # Make some verification
     if not os.path.isdir(path):
@@ -240,156 +1331,199 @@ def main(path, separator: str = "", offset: int = 0, threshold: float = None, op
         if output_file.split(".")[-1] != "txt": 
             output_file += ".txt"
 
-    if output_type not in ("file", "both", "position"):
-        raise ValueError(f"<output_type> is expected to be 'file', 'both' or 'position'. Got : {output_type}")
+    check_comparison_settings(threshold, output_type, sketch, structural_overlap)
+
+    if pipeline < 0:
+        raise ValueError(f"<pipeline> is expected to be greater or equal to 0. Got : {pipeline}")
+    if processes < 1:
+        raise ValueError(f"<processes> is expected to be greater or equal to 1. Got : {processes}")
+    if processes > 1 and pipeline > 0:
+        raise ValueError("<processes> and <pipeline> can not be used at the same time.")
+    if resume and not output_file:
+        raise ValueError("<resume> can only be used with an <output_file>.")
+    if memory_limit is not None:
+        if memory_limit <= 0:
+            raise ValueError(f"<memory_limit> is expected to be greater than 0. Got : {memory_limit}")
+        if processes > 1:
+            raise ValueError("<memory_limit> and <processes> can not be used at the same time.")
+        if sketch > 0:
+            raise ValueError("<memory_limit> and <sketch> can not be used at the same time.")
+
+    if profile is not None:
+        if os.path.exists(profile) and not os.path.isdir(profile):
+            raise NameError(f"Directory expected for <profile>. Got : {profile}")
+        os.makedirs(profile, exist_ok=True)
 
+    # prepare some variables
+    str_settings = settings_string(path, separator, offset, threshold, open_files, quiet, output_file,
+                                   complete_names, output_type, **result_settings(sketch, sketch_exact,
+                                                                                  structural_overlap, multi_samples))
+
+    # Prepare <output_file> and its journal. The journal store which groups are completed.
+    journal_path = None
+    completed = {}
     if output_file:
-        with open(output_file, mode="w") as file:
-            # Create a file named <output_file>.
-            pass
+        journal_path = output_file + JOURNAL_EXTENSION
+        # <quiet> does not change results : a run can be resumed with another <quiet>.
+        settings_hash = hashlib.sha1(settings_string(path, separator, offset, threshold, open_files, True,
+                                                     output_file, complete_names, output_type,
+                                                     **result_settings(sketch, sketch_exact, structural_overlap,
+                                                                       multi_samples)).encode()).hexdigest()
+
+        if resume and os.path.isfile(journal_path) and os.path.isfile(output_file):
+            journal_hash, completed, complete_size = _read_journal(journal_path)
+            if journal_hash is not None and journal_hash != settings_hash:
+                raise ValueError(f"Can not resume '{output_file}' : it has been made with other settings.")
+
+            # Remove a partial line : new lines must not be appended to it.
+            with open(journal_path, mode="r+") as file:
+                file.truncate(complete_size)
+
+            # Remove the end of a paragraph that was written when the previous run stopped.
+            with open(output_file, mode="r+") as file:
+                file.truncate(max(completed.values(), default=0))
 
-    # prepare some variables
-    str_settings = f"path='{path}';separator='{separator}';offset={offset};threshold={threshold};"
-    str_settings += f"open_files={open_files};quiet={quiet};output_file={output_file};complete_names={complete_names};"
-    str_settings += f"output_type={output_type};SVersion={__version__};CVersion={compare.__version__}\n"
+        else:
+            completed = {}
+            with open(output_file, mode="w") as file:
+                # Create a file named <output_file>.
+                pass
 
-    if not quiet: print("settings : ", str_settings)
+        if len(completed) == 0:
+            with open(journal_path, mode="w") as file:
+                file.write(f"#settings={settings_hash}\n")
 
-    # --- --- Find all vcf files --- ---
-    if not quiet: print("======== Indexing =========\nIndexing .vcf files. This can take some time.")
-    list_of_path = find_variant_call_format_file(path, open_files, quiet=quiet, one_sample_only=True)
-    if not quiet: print(f"Indexing done : {len(list_of_path)} files found.")
+    if not quiet: print("settings : ", str_settings)
 
-    if len(list_of_path) == 0:
+    # --- --- Find and group all vcf files --- ---
+    if grouped_files is None:
+        grouped_files = index_groups(path, separator=separator, open_files=open_files, quiet=quiet,
+                                     manifest=manifest, multi_samples=multi_samples)
+    if len(grouped_files) == 0:
         print("No file found.")
         return
 
-    #  --- --- Group files --- ---
-    if not quiet:
-        p_sep = separator if len(separator) > 0 else "folder names"
-        print(f"======== Group files =========\n"
-              f"Separator used : {p_sep}")
-
-    if len(separator) == 0:
-        grouped_files = group_file_by_folder(list_of_path)
-    else:
-        grouped_files = group_file_by_name(list_of_path, separator=separator)
-    
-    if not quiet:
-        print(f"{len(grouped_files)} Groups made :")
-        for group_names, content in grouped_files.items():
-            print(f"    {group_names} : {len(content)} item(s)")
-    
     #  --- --- file Processing --- ---
-    file_legend = "#GSCORE\tGF\tGM\tISCORE\tIF\tIM\tFILE\n"
-    position_legend = "#SCORE\tCHROM\tPOS\tGF\tGM\tOCUR\n"
-    for groups_name, list_of_files in grouped_files.items():
-        if not quiet: print(f"===== Group : '{groups_name}' ====")
+    compare_options = {"str_settings": str_settings, "offset": offset, "threshold": threshold,
+                       "output_type": output_type, "complete_names": complete_names, "sketch": sketch,
+                       "sketch_exact": sketch_exact, "structural_overlap": structural_overlap, "blocked": blocked}
+    # Spans of structural variants are inside INFO. INFO is only parsed for structural variants.
+    load_options = {"info": True, "parse_info": False} if structural_overlap is not None else {}
+    if multi_samples:
+        load_options["multi_samples"] = True
+    memory_bytes = memory_limit * 1024 * 1024 if memory_limit is not None else None
+
+    groups = [(group_index, groups_name, list_of_files) for group_index, (groups_name, list_of_files)
+              in enumerate(grouped_files.items()) if groups_name not in completed
+              and (only_groups is None or groups_name in only_groups)]
+    if not quiet and len(completed) > 0:
+        print(f"{len(completed)} group(s) already completed : {len(groups)} group(s) left.")
+
+    if processes > 1:
+        paragraphs = _parallel_groups(groups, processes, quiet=quiet, profile=profile, load_options=load_options,
+                                      **compare_options)
+    elif pipeline > 0:
+        paragraphs = _pipeline_groups(groups, pipeline, quiet=quiet, profile=profile, load_options=load_options,
+                                      memory_limit=memory_bytes, **compare_options)
+    else:
+        paragraphs = _sequential_groups(groups, quiet=quiet, profile=profile, load_options=load_options,
+                                        memory_limit=memory_bytes, **compare_options)
 
-        # Groups can not be too smalls
-        if len(list_of_files) < 2:
-            if not quiet: print(f"'{groups_name}' group is too small : {len(list_of_files)} item(s) / {2}.")
+    for group_index, groups_name, paragraph in paragraphs:
+        if paragraph is not None and not output_paragraph(paragraph, output_file, quiet=quiet):
+            # This group is not inside <output_file> : it will be done again if this run is resumed.
             continue
+        if journal_path is not None:
+            _journal_group(journal_path, group_index, groups_name, output_file)
 
-        # --- Load files ---
-        group_dict = {}
-        for paths in list_of_files:
-            # Handle errors raised by <compare.load_vcf_positions>
-            try:
-                vcf_dict = compare.load_vcf_positions(paths, all_=False, alt=True)
-            except IndexError as E:
-                if not quiet: print(f"Can not load {paths} : {E}")
-                continue
-            except ValueError as E:
-                if not quiet: print(E)
-                continue
-            else:
-                # Save results
-                group_dict[paths] = vcf_dict
 
-        # Groups can not be too smalls (again). Group can reduce in volume if some file can not be load.
-        if len(group_dict) < 2:
-            if not quiet: print(f"Can not use this group. Not enough file can be loaded.")
-            continue
+def cli(argv: list[str] = None):
+    """Console entry point ('vcf-comparator', see pyproject.toml). Options are the ones of main.sh, with long names
+    (see <main>). eg : vcf-comparator -p ~/data -s - -o 10 --files --output-file results.txt
 
-        # --- File comparisons ---
-        score_dict, position_dict = compare.compare_replicat(offset=offset, sequence_threshold=threshold,
-                                                             quiet=quiet, **group_dict)
+    With --batch, each line of a file is a run (same options, blank lines and lines starting with '#' are ignored).
+    Options given on the command line are used as defaults by each line. All runs are made by the same interpreter
+    and a path is indexed only once for all lines that use it with the same indexing options.
+    eg : vcf-comparator --batch runs.txt -o 10 --files    with runs.txt :
+            -p /data/run1 --output-file run1.txt
+            -p /data/run2 --group /data/run2/P15 --group /data/run2/P30
 
-        # --- Display results ---
-        # Group header
-        group_header_has_been_displayed = False     # Assure that the header of a group is displayed only once.
-        paragraph = ""
+    :param list argv:   Arguments. If None, sys.argv[1:] is used.
+    """
+    import argparse
+    import shlex
+
+    parser = argparse.ArgumentParser(prog="vcf-comparator", description="Seek, group and compare .vcf files.")
+    parser.add_argument("-p", "--path", default="~", help="Folder where .vcf files are gathered (default: ~).")
+    parser.add_argument("-s", "--separator", default="",
+                        help="Separator used to group files. If unspecified, parent folders are used.")
+    parser.add_argument("-o", "--offset", type=int, default=0, help="How close two positions should be.")
+    parser.add_argument("-t", "--threshold", type=float, default=None,
+                        help="Minimal alignment score (0-100) of two sequences.")
+    parser.add_argument("-d", "--no-open-files", dest="open_files", action="store_false",
+                        help="Do not open files during the search.")
+    parser.add_argument("-v", "--verbose", dest="quiet", action="store_false", help="Display information.")
+    parser.add_argument("-g", "--files", dest="output_type", action="store_const", const="file", default="position",
+                        help="Only return Files comparison.")
+    parser.add_argument("-b", "--both", dest="output_type", action="store_const", const="both",
+                        help="Return Files comparison and Variants summarization.")
+    parser.add_argument("-c", "--complete-names", action="store_true", help="Show files with their complete path.")
+    parser.add_argument("-r", "--output-file", default=None, help="File where results are saved.")
+    parser.add_argument("-P", "--profile", default=None, help="Folder where profiling statistics are saved.")
+    parser.add_argument("-w", "--pipeline", type=int, default=0, help="Number of groups handled at the same time.")
+    parser.add_argument("-j", "--processes", type=int, default=1, help="Number of processes.")
+    parser.add_argument("-k", "--resume", action="store_true", help="Resume a previous run (requires -r).")
+    parser.add_argument("-a", "--sketch", type=int, default=0, help="Size of MinHash sketches (Files comparison).")
+    parser.add_argument("-A", "--sketch-exact", type=float, default=None,
+                        help="Couples of files this far from the mean GSCORE are compared exactly.")
+    parser.add_argument("-S", "--structural-overlap", type=float, default=None,
+                        help="Minimal reciprocal overlap (0-100) of two structural variants.")
+    parser.add_argument("-I", "--manifest", default=None, help="File where the search of .vcf files is saved.")
+    parser.add_argument("-m", "--multi-samples", action="store_true", help="Use each sample of multi-samples files.")
+    parser.add_argument("-M", "--memory-limit", type=float, default=None, help="Memory budget (MB) for loaded files.")
+    parser.add_argument("-B", "--blocked", action="store_true",
+                        help="Search close positions by blocks (faster with large offsets).")
+    parser.add_argument("--group", dest="only_groups", action="append", default=None,
+                        help="Only compare this group (can be repeated).")
+    parser.add_argument("--batch", default=None, help="File with one run per line (see above).")
+
+    arguments = parser.parse_args(argv)
+    if arguments.batch is None:
+        runs = [arguments]
+    else:
+        with open(arguments.batch) as file:
+            # A copy of <arguments> is given to each line : its values are used as defaults.
+            runs = [parser.parse_args(shlex.split(lines), namespace=argparse.Namespace(**vars(arguments)))
+                    for lines in file if lines.strip() and not lines.lstrip().startswith("#")]
 
-        # --- Output scores related to files ---
-        if output_type in ("file", "both"):
-            paragraph = (f"###{groups_name}\tglobal={round(score_dict['__MEANS__']['__MEANS__'][0], 4)}\t"
-                         f"settings: {str_settings}")
-            group_header_has_been_displayed = True
+    indexes = {}    # Indexing options : groups (see <index_groups>).
+    for run in runs:
+        options = vars(run)
+        del options["batch"]
+        options["path"] = os.path.abspath(os.path.expanduser(options["path"]))
 
-            for paths, comparisons in score_dict.items():
-                if paths == "__MEANS__":
-                    # This key is not a file. This key is used to store file's means.
-                    continue
+        if not os.path.isdir(options["path"]):
+            raise NameError(f"Directory expected for <path>. Got : {options['path']}")
 
-                # Reduce name size
-                if complete_names is False:
-                    name = paths.split("/")[-1].split("\\")[-1]
-                else:
-                    name = paths
-
-                # Generate a text related to this file.
-                path_means = score_dict['__MEANS__'][paths]
-                paragraph += f"##{name}\tglobal={round(path_means[0], 4)}\tinclusion={round(path_means[1], 4)}\n"
-                paragraph += file_legend
-
-                # Assure that result are sorted by best GScore and by best IScore.
-                sorted_comparisons = sorted(comparisons.items(), key=lambda item: (item[1][0], item[1][3]), reverse=True)
-
-                # Display information related to each comparison
-                for second_path, results in sorted_comparisons:
-                    paragraph += "\t".join([str(items) for items in results]) + "\t" + second_path + "\n"
-
-        # --- Output scores related to positions ---
-        if output_type in ("position", "both"):
-            if group_header_has_been_displayed is False:
-                paragraph += f"###{groups_name}\tsettings: {str_settings}"
-                group_header_has_been_displayed = True
-
-            paragraph += position_legend
-
-            # Assure that positions are displayed from the greater occurrence to the lowest.
-            # When two position has the same occurrence, chrom and position are used.
-            sorted_positions = sorted(position_dict.items(), key=lambda item: (round(len(item[1][0]) / item[1][1] * 100, 4), item[0][0], 
-                                      -1 * item[0][1]), reverse=True)
-
-            # Display positions
-            for position, (found, max_, elements) in sorted_positions:
-                found = len(found)
-                elements_detail = ";".join([f"{key}={item}" for key, item in elements.items()])
-                chrom, pos = position
-                paragraph += f"{round(found / max_ * 100, 4)}\t{chrom}\t{pos}\t{found}\t{max_}\t{elements_detail}\n"
-
-        # Output result
-        if output_file:
-            try:
-                with open(output_file, mode="a") as file:
-                    file.write(paragraph)
-            except Exception as E:
-                print(f" --- --- --- --- Can not proceed file write : {E} --- --- --- ---")
-                print(paragraph) # Do not loose work 
-                print(f" --- --- --- --- Can not proceed file write : {E} --- --- --- ---")
-            else:
-                if not quiet:
-                    print(paragraph)
-        else:
-            print(paragraph)
+        index_key = (options["path"], options["separator"], options["open_files"], options["manifest"],
+                     options["multi_samples"])
+        if index_key not in indexes:
+            indexes[index_key] = index_groups(options["path"], separator=options["separator"],
+                                              open_files=options["open_files"], quiet=options["quiet"],
+                                              manifest=options["manifest"], multi_samples=options["multi_samples"])
+
+        main(grouped_files=indexes[index_key], **options)
 
 
 if __name__ == "__main__":  # If this file isn't an import.
     sys_args = sys.argv[1:]
     args_length = len(sys_args)
 
+    if args_length >= 1 and sys_args[0].startswith("-"):
+        # Options with names (see <cli>).
+        cli(sys_args)
+        sys.exit()
+
     # Translate arguments from sys.argv[1:] and call <main>()
 
     # path
@@ -457,7 +1591,82 @@ if __name__ == "__main__":  # If this file isn't an import.
             main_complete_names = False
     else:
         main_complete_names = False
-        
+
+    # profile
+    if args_length >= 10 and sys_args[9] != "none":
+        main_profile = sys_args[9]
+    else:
+        main_profile = None
+
+    # pipeline
+    if args_length >= 11:
+        try:
+            main_pipeline = int(sys_args[10])
+        except ValueError:
+            raise ValueError(f"Integer expected for the 'pipeline' option. Got : {sys_args[10]}")
+    else:
+        main_pipeline = 0
+
+    # processes
+    if args_length >= 12:
+        try:
+            main_processes = int(sys_args[11])
+        except ValueError:
+            raise ValueError(f"Integer expected for the 'processes' option. Got : {sys_args[11]}")
+    else:
+        main_processes = 1
+
+    # resume
+    main_resume = args_length >= 13 and sys_args[12] in ("true", "1", "y")
+
+    # sketch
+    if args_length >= 14:
+        try:
+            main_sketch = int(sys_args[13])
+        except ValueError:
+            raise ValueError(f"Integer expected for the 'sketch' option. Got : {sys_args[13]}")
+    else:
+        main_sketch = 0
+
+    # sketch_exact
+    if args_length >= 15 and sys_args[14] != "none":
+        try:
+            main_sketch_exact = float(sys_args[14])
+        except ValueError:
+            raise ValueError(f"Float expected for the 'sketch_exact' option. Got : {sys_args[14]}")
+    else:
+        main_sketch_exact = None
+
+    # structural_overlap
+    if args_length >= 16 and sys_args[15] != "none":
+        try:
+            main_structural_overlap = float(sys_args[15])
+        except ValueError:
+            raise ValueError(f"Float expected for the 'structural_overlap' option. Got : {sys_args[15]}")
+    else:
+        main_structural_overlap = None
+
+    # manifest
+    if args_length >= 17 and sys_args[16] != "none":
+        main_manifest = sys_args[16]
+    else:
+        main_manifest = None
+
+    # multi_samples
+    main_multi_samples = args_length >= 18 and sys_args[17] in ("true", "1", "y")
+
+    # memory_limit
+    if args_length >= 19 and sys_args[18] != "none":
+        try:
+            main_memory_limit = float(sys_args[18])
+        except ValueError:
+            raise ValueError(f"Float expected for the 'memory_limit' option. Got : {sys_args[18]}")
+    else:
+        main_memory_limit = None
+
+    # blocked
+    main_blocked = args_length >= 20 and sys_args[19] in ("true", "1", "y")
+
     # main
     main(
         path=main_path,
@@ -469,4 +1678,15 @@ if __name__ == "__main__":  # If this file isn't an import.
         output_file=main_output,
         output_type=main_output_type,
         complete_names=main_complete_names,
+        profile=main_profile,
+        pipeline=main_pipeline,
+        processes=main_processes,
+        resume=main_resume,
+        sketch=main_sketch,
+        sketch_exact=main_sketch_exact,
+        structural_overlap=main_structural_overlap,
+        manifest=main_manifest,
+        multi_samples=main_multi_samples,
+        memory_limit=main_memory_limit,
+        blocked=main_blocked,
     )
@@ -0,0 +1,331 @@
+# encoding=utf-8
+"""This file contain a small local server that compare groups of .vcf files on demand. Files are indexed and grouped
+once (as <scan.main> would do) and loaded files are kept in memory : a group that has already been used can be
+compared again without reading its files. The tree is indexed again regularly and files that changed since they were
+loaded are loaded again.
+
+The server listen on localhost (HTTP) and answer to :
+    GET /groups                 One line per group : '{group name}\\t{number of files}'.
+    GET /compare?group=<name>   The result of <scan.main> for this group (same text). Without 'group', all groups
+                                are returned. Other accepted parameters (see <scan.main>) : offset, threshold,
+                                output_type, complete_names, sketch, sketch_exact, structural_overlap.
+    GET /status                 Number of loaded files, memory used by loaded files, number of kept results,
+                                memory used by kept results and memory limit.
+
+If you decide to call this file from Bash, here a list of accepted arguments (see <serve>):
+    1 - folder_path
+    2 - separator
+    3 - open_files
+    4 - port
+    5 - memory_limit
+    6 - interval
+    7 - quiet
+    8 - manifest
+
+eg : curl "http://localhost:8642/compare?group=P15&offset=10&output_type=both"
+"""
+
+__author__ = "Marchal Florent"
+__copyright__ = "Copyright 2023, Marchal Florent"
+__credits__ = ["Marchal Florent", " Fiston-Lavier Anna-Sophie"]
+__license__ = "CC-BY-SA-4.0"
+__version__ = "1.0.2"
+__maintainer__ = "Marchal Florent"
+__email__ = "flo.marchal2002@gmail.com"
+__status__ = "Production"
+
+
+import os
+import sys
+import threading
+import collections
+import urllib.parse
+import http.server
+import scan
+
+
+RESULT_CACHE_SIZE = 256     # Maximum number of paragraphs kept by the server (they also count in <memory_limit>).
+
+
+def serve(path: str, separator: str = "", open_files: bool = True, port: int = 8642, memory_limit: float = 1024,
+          interval: float = 60, quiet: bool = True, manifest: str = None):
+    """Start the server (see this file's documentation). This function never ends.
+
+    :param str path:            A path from where .vcf files are gathered (see <scan.main>).
+    :param str separator:       A string that is used to split files names in order to groups them (see <scan.main>).
+    :param bool open_files:     Does files are opened during the indexing to verify that they are variant call format ?
+    :param int port:            Port used on localhost.
+    :param float memory_limit:  Memory (MB) that loaded files and kept results can use. Least recently used results
+                                    are forgotten first, then least recently used files.
+    :param float interval:      The tree is indexed again every <interval> seconds.
+    :param bool quiet:          If False, requests and indexing are printed.
+    :param str manifest:        A path toward a manifest (see <scan.load_manifest>). If not None, each indexing only
+                                    look at folders and files that changed since the previous one.
+    """
+    if not os.path.isdir(path):
+        raise NameError(f"Directory expected for <path>. Got : {path}")
+    if memory_limit <= 0:
+        raise ValueError(f"<memory_limit> is expected to be greater than 0. Got : {memory_limit}")
+
+    state = {
+        "path": path, "separator": separator, "open_files": open_files, "quiet": quiet, "manifest": manifest,
+        "memory_limit": memory_limit * 1024 * 1024,
+        "lock": threading.Lock(),
+        "groups": scan.index_groups(path, separator=separator, open_files=open_files, quiet=quiet,
+                                    manifest=manifest),
+        "files": collections.OrderedDict(),     # (path, load options) : (mtime, size, vcf_dict, estimated bytes)
+        "files_size": 0,
+        "results": collections.OrderedDict(),   # (group, files' stamps, settings) : paragraph
+        "results_size": 0,
+    }
+
+    watcher = threading.Thread(target=_watch, args=(state, interval), daemon=True)
+    watcher.start()
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _RequestHandler)
+    server.state = state
+    if not quiet: print(f"Listening on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+def compare_cached_group(state: dict, groups_name: str, offset: int = 0, threshold: float = None,
+                         output_type: str = "position", complete_names: bool = False, sketch: int = 0,
+                         sketch_exact: float = None, structural_overlap: float = None) -> str:
+    """Compare a group using files kept in memory (see <scan.compare_group> for arguments).
+
+    :param dict state:          State of the server (see <serve>).
+    :param str groups_name:     Name of the group.
+    :return str: The paragraph of this group or None if this group can not be compared.
+    """
+    with state["lock"]:
+        list_of_files = state["groups"][groups_name]
+    if len(list_of_files) < 2:
+        return None
+
+    load_options = {"info": True, "parse_info": False} if structural_overlap is not None else {}
+    group_dict, stamps = {}, []
+    for paths in list_of_files:
+        stamp, vcf_dict = _load_cached(state, paths, load_options)
+        stamps.append(stamp)
+        if vcf_dict is not None:
+            group_dict[paths] = vcf_dict
+    if len(group_dict) < 2:
+        return None
+
+    # Paragraphs are kept as long as files and settings do not change.
+    settings = (offset, threshold, output_type, complete_names, sketch, sketch_exact, structural_overlap)
+    result_key = (groups_name, tuple(stamps), settings)
+    with state["lock"]:
+        if result_key in state["results"]:
+            state["results"].move_to_end(result_key)
+            return state["results"][result_key]
+
+    str_settings = scan.settings_string(state["path"], state["separator"], offset, threshold, state["open_files"],
+                                        True, None, complete_names, output_type,
+                                        **scan.result_settings(sketch, sketch_exact, structural_overlap))
+    paragraph = scan.compare_group(groups_name, group_dict, str_settings, offset=offset, threshold=threshold,
+                                   output_type=output_type, complete_names=complete_names, sketch=sketch,
+                                   sketch_exact=sketch_exact, structural_overlap=structural_overlap)
+
+    with state["lock"]:
+        # A paragraph bigger than the whole budget is not kept.
+        if result_key not in state["results"] and _paragraph_size(paragraph) <= state["memory_limit"]:
+            state["results"][result_key] = paragraph
+            state["results_size"] += _paragraph_size(paragraph)
+        while len(state["results"]) > RESULT_CACHE_SIZE:
+            state["results_size"] -= _paragraph_size(state["results"].popitem(last=False)[1])
+        _forget(state)
+    return paragraph
+
+
+def _load_cached(state: dict, path: str, load_options: dict) -> tuple:
+    """Internal function. Return a loaded file. The file is loaded (see <scan.load_group>) if it is not in memory or
+    if it changed since it was loaded.
+
+    :param dict state:          State of the server (see <serve>).
+    :param str path:            A path toward a .vcf file.
+    :param dict load_options:   Other columns to load (see <scan.load_group>).
+    :return tuple: ((path, mtime, size), vcf_dict). vcf_dict is None if this file can not be loaded.
+    """
+    try:
+        file_stat = os.stat(path)
+        stamp = (path, file_stat.st_mtime_ns, file_stat.st_size)
+    except OSError:
+        return (path, None, None), None
+
+    key = (path, tuple(sorted(load_options.items())))
+    with state["lock"]:
+        if key in state["files"] and state["files"][key][0:2] == stamp[1:]:
+            state["files"].move_to_end(key)
+            return stamp, state["files"][key][2]
+
+    vcf_dict = scan.load_group([path], quiet=state["quiet"], **load_options).get(path)
+    size = 0 if vcf_dict is None else _estimate_size(vcf_dict)
+
+    with state["lock"]:
+        if key in state["files"]:
+            state["files_size"] -= state["files"].pop(key)[3]
+        state["files"][key] = (stamp[1], stamp[2], vcf_dict, size)
+        state["files_size"] += size
+        _forget(state)
+
+    return stamp, vcf_dict
+
+
+def _forget(state: dict):
+    """Internal function. Forget least recently used results, then least recently used files, until they fit inside
+    <memory_limit> (see <serve>). The last loaded file is always kept. <state>'s lock must be held.
+
+    :param dict state:  State of the server (see <serve>).
+    """
+    while state["files_size"] + state["results_size"] > state["memory_limit"]:
+        if state["results"]:
+            state["results_size"] -= _paragraph_size(state["results"].popitem(last=False)[1])
+        elif len(state["files"]) > 1:
+            state["files_size"] -= state["files"].popitem(last=False)[1][3]
+        else:
+            break
+
+
+def _paragraph_size(paragraph: str) -> int:
+    """Internal function. Estimate the memory used by a kept paragraph.
+
+    :param str paragraph:   A paragraph made by <scan.compare_group> or None.
+    :return int: Estimated size in bytes.
+    """
+    return 0 if paragraph is None else sys.getsizeof(paragraph)
+
+
+def _estimate_size(vcf_dict: dict) -> int:
+    """Internal function. Estimate the memory used by a loaded file.
+
+    :param dict vcf_dict:   A file loaded by <compare.load_vcf_positions>.
+    :return int: Estimated size in bytes.
+    """
+    number_of_lines = sum(len(lines) for lines in vcf_dict.values())
+    return len(vcf_dict) * scan.POSITION_BYTES + number_of_lines * scan.LINE_BYTES
+
+
+def _watch(state: dict, interval: float):
+    """Internal function. Index and group files again every <interval> seconds. There is no portable way to be
+    notified of changes with the standard library : the tree is polled (cheap when a manifest is used).
+
+    :param dict state:      State of the server (see <serve>).
+    :param float interval:  Time between two indexing (seconds).
+    """
+    stop = threading.Event()
+    while not stop.wait(interval):
+        groups = scan.index_groups(state["path"], separator=state["separator"], open_files=state["open_files"],
+                                   quiet=True, manifest=state["manifest"])
+        with state["lock"]:
+            state["groups"] = groups
+        if not state["quiet"]: print(f"Tree indexed again : {len(groups)} groups.")
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    """Internal class. Answer to requests (see this file's documentation). http.server require a class."""
+
+    def do_GET(self):
+        state = self.server.state
+        url = urllib.parse.urlparse(self.path)
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+
+        if url.path == "/groups":
+            with state["lock"]:
+                groups = list(state["groups"].items())
+            self._answer(200, "".join(f"{name}\t{len(files)}\n" for name, files in groups))
+
+        elif url.path == "/status":
+            with state["lock"]:
+                status = f"files={len(state['files'])}\tmemory={state['files_size']}\t" \
+                         f"results={len(state['results'])}\tresults_memory={state['results_size']}\t" \
+                         f"memory_limit={state['memory_limit']}\n"
+            self._answer(200, status)
+
+        elif url.path == "/compare":
+            try:
+                settings = _parse_settings(query)
+            except ValueError as E:
+                self._answer(400, f"{E}\n")
+                return
+
+            with state["lock"]:
+                groups_names = list(state["groups"]) if "group" not in query else [query["group"]]
+                unknown = [name for name in groups_names if name not in state["groups"]]
+            if unknown:
+                self._answer(404, f"Unknown group : {unknown[0]}\n")
+                return
+
+            try:
+                paragraphs = [compare_cached_group(state, name, **settings) for name in groups_names]
+            except (ValueError, NameError) as E:
+                self._answer(400, f"{E}\n")
+                return
+            self._answer(200, "".join(paragraph for paragraph in paragraphs if paragraph is not None))
+
+        else:
+            self._answer(404, "Unknown request. Use /groups, /compare or /status.\n")
+
+    def _answer(self, code: int, text: str):
+        body = text.encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.state["quiet"]:
+            super().log_message(format, *args)
+
+
+def _parse_settings(query: dict) -> dict:
+    """Internal function. Turn parameters of a '/compare' request into arguments for <compare_cached_group>.
+
+    :param dict query:  Parameters of the request.
+    :return dict: Arguments for <compare_cached_group>.
+    """
+    settings = {
+        "offset": int(query.get("offset", 0)),
+        "threshold": None if query.get("threshold", "none") == "none" else float(query["threshold"]),
+        "output_type": query.get("output_type", "position"),
+        "complete_names": query.get("complete_names", "false") in ("true", "1", "y"),
+        "sketch": int(query.get("sketch", 0)),
+        "sketch_exact": None if query.get("sketch_exact", "none") == "none" else float(query["sketch_exact"]),
+        "structural_overlap": (None if query.get("structural_overlap", "none") == "none"
+                               else float(query["structural_overlap"])),
+    }
+    # Same verifications as <scan.main>.
+    scan.check_comparison_settings(settings["threshold"], settings["output_type"], settings["sketch"],
+                                   settings["structural_overlap"])
+    return settings
+
+
+if __name__ == "__main__":  # If this file isn't an import.
+    sys_args = sys.argv[1:]
+    args_length = len(sys_args)
+
+    main_path = sys_args[0] if args_length >= 1 and sys_args[0] != "none" else os.path.expanduser("~")
+    main_separator = sys_args[1] if args_length >= 2 and sys_args[1] != "none" else ""
+    main_open_files = sys_args[2] in ("true", "1", "y") if args_length >= 3 else True
+
+    try:
+        main_port = int(sys_args[3]) if args_length >= 4 else 8642
+    except ValueError:
+        raise ValueError(f"Integer expected for the 'port' option. Got : {sys_args[3]}")
+
+    try:
+        main_memory_limit = float(sys_args[4]) if args_length >= 5 else 1024
+    except ValueError:
+        raise ValueError(f"Float expected for the 'memory_limit' option. Got : {sys_args[4]}")
+
+    try:
+        main_interval = float(sys_args[5]) if args_length >= 6 else 60
+    except ValueError:
+        raise ValueError(f"Float expected for the 'interval' option. Got : {sys_args[5]}")
+
+    main_quiet = args_length >= 7 and sys_args[6] in ("true", "1", "y")
+    main_manifest = sys_args[7] if args_length >= 8 and sys_args[7] != "none" else None
+
+    serve(main_path, separator=main_separator, open_files=main_open_files, port=main_port,
+          memory_limit=main_memory_limit, interval=main_interval, quiet=main_quiet, manifest=main_manifest)